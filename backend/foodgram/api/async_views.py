@@ -0,0 +1,290 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    NotFound,
+    ValidationError,
+)
+from rest_framework.renderers import JSONRenderer
+
+from mixins import conditional_headers, set_conditional_headers
+from recipes.membership import (
+    CART,
+    FAVORITES,
+    SUBSCRIPTIONS,
+    aprefetch_membership,
+)
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.tag_masks import amasks_by_slug
+from recipes.versions import (
+    INGREDIENTS_VERSION,
+    TAGS_VERSION,
+    aget_version,
+    aget_versions,
+)
+from .autocomplete import ingredient_index
+from .filters import RecipeFilter, filter_by_name_prefix
+from .pagination import AsyncRecipePagination, AsyncSubscriptionPagination
+from .serializers import (
+    IngredientSerializer,
+    RecipeSerializer,
+    ShowSubscriptionsSerializer,
+    TagSerializer,
+)
+from .views import (
+    IngredientViewSet,
+    RecipeViewSet,
+    ShowSubscriptionsViewSet,
+    TagViewSet,
+    collection_validators,
+    recipe_ordering,
+    recipe_validators,
+    recipe_version_keys,
+    recipes_for_reading,
+    subscriptions_for,
+)
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def json_response(data, status=200):
+    # DRF добавляет Vary: Accept ко всем ответам, общий кэш не должен
+    # путать JSON с ответом другого рендерера.
+    response = HttpResponse(JSONRenderer().render(data), status=status,
+                            content_type='application/json')
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def error_response(error):
+    data = error.detail
+    if not isinstance(data, (dict, list)):
+        data = {'detail': data}
+    response = json_response(data, error.status_code)
+    if isinstance(error, (AuthenticationFailed, NotAuthenticated)):
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+async def authenticate(request):
+    """Пользователь по заголовку Authorization, как TokenAuthentication."""
+    header = request.headers.get('Authorization', '').split()
+    if not header or header[0].lower() != 'token':
+        return AnonymousUser()
+    if len(header) == 1:
+        raise AuthenticationFailed(
+            _('Invalid token header. No credentials provided.'))
+    if len(header) > 2:
+        raise AuthenticationFailed(
+            _('Invalid token header. '
+              'Token string should not contain spaces.'))
+    try:
+        token = await Token.objects.select_related('user').aget(
+            key=header[1])
+    except Token.DoesNotExist:
+        raise AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise AuthenticationFailed(_('User inactive or deleted.'))
+    return token.user
+
+
+def read_view(handler, fallback):
+    """GET и HEAD обслуживает handler, остальное - синхронный DRF.
+
+    handler возвращает None, если запрос ему не по силам (например,
+    курсорная пагинация), и тогда ответ тоже строит DRF.
+    """
+    fallback = sync_to_async(fallback)
+
+    async def view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            request.query_params = request.GET
+            try:
+                request.user = await authenticate(request)
+                response = await handler(request, *args, **kwargs)
+            except APIException as error:
+                return error_response(error)
+            if response is not None:
+                return response
+        return await fallback(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
+
+
+async def conditional(request, validators, handler):
+    """Асинхронный вариант ConditionalGetMixin.conditional."""
+    if validators is None:
+        return await handler()
+    etag, last_modified = conditional_headers(*validators)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await handler()
+    else:
+        patch_vary_headers(response, ['Accept'])
+    return set_conditional_headers(response, etag, last_modified)
+
+
+async def get_or_404(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise NotFound()
+
+
+async def tag_list(request):
+    version = await aget_version(TAGS_VERSION)
+
+    async def respond():
+        tags = [tag async for tag in Tag.objects.all()]
+        return json_response(TagSerializer(tags, many=True).data)
+
+    return await conditional(
+        request, collection_validators(TAGS_VERSION, version), respond)
+
+
+async def tag_detail(request, pk):
+    version = await aget_version(TAGS_VERSION)
+
+    async def respond():
+        instance = await get_or_404(Tag.objects.all(), pk=pk)
+        return json_response(TagSerializer(instance).data)
+
+    return await conditional(
+        request, collection_validators(TAGS_VERSION, version), respond)
+
+
+async def ingredient_list(request):
+    version = await aget_version(INGREDIENTS_VERSION)
+
+    async def respond():
+        # Индекс живёт в памяти процесса и перестраивается под блокировкой
+        # потоков, поэтому обращение к нему выполняется в пуле.
+        name = request.query_params.get('name')
+        if name is None:
+            data = await sync_to_async(ingredient_index.all)()
+        else:
+            data = await sync_to_async(ingredient_index.search)(name)
+        return json_response(data)
+
+    return await conditional(
+        request, collection_validators(INGREDIENTS_VERSION, version),
+        respond)
+
+
+async def ingredient_detail(request, pk):
+    version = await aget_version(INGREDIENTS_VERSION)
+
+    async def respond():
+        queryset = Ingredient.objects.all()
+        name = request.query_params.get('name')
+        if name is not None:
+            queryset = filter_by_name_prefix(queryset, name)
+        instance = await get_or_404(queryset, pk=pk)
+        return json_response(IngredientSerializer(instance).data)
+
+    return await conditional(
+        request, collection_validators(INGREDIENTS_VERSION, version),
+        respond)
+
+
+async def recipe_state(request, queryset):
+    try:
+        state = await queryset.aaggregate(count=Count('pk'),
+                                          updated=Max('updated_at'))
+    except (TypeError, ValueError):
+        return None
+    if not state['count']:
+        return None
+    versions = await aget_versions(recipe_version_keys(request))
+    return recipe_validators(state, versions, recipe_ordering(request))
+
+
+def order_recipes(queryset, request):
+    """Сортировка из параметра ordering, как у OrderingFilter."""
+    fields = [
+        field.strip()
+        for field in request.query_params.get('ordering', '').split(',')
+    ]
+    fields = [field for field in fields
+              if field.lstrip('-') in RecipeViewSet.ordering_fields]
+    return queryset.order_by(*fields) if fields else queryset
+
+
+async def serialize_recipes(request, recipes, many=False):
+    await aprefetch_membership(request, [FAVORITES, CART, SUBSCRIPTIONS])
+    return RecipeSerializer(recipes, many=many,
+                            context={'request': request}).data
+
+
+async def recipe_list(request):
+    paginator = AsyncRecipePagination()
+    if paginator.use_cursor(request):
+        return None
+    # Варианты фильтра tags берутся из кэша масок: прогреваем его, чтобы
+    # проверка формы не обращалась к базе синхронно.
+    await amasks_by_slug()
+    filterset = RecipeFilter(request.query_params,
+                             queryset=recipes_for_reading(), request=request)
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    validators = await recipe_state(
+        request, filterset.filter_queryset(Recipe.objects.all()))
+
+    async def respond():
+        page = await paginator.apaginate_queryset(
+            order_recipes(filterset.qs, request), request)
+        data = await serialize_recipes(request, page, many=True)
+        return json_response(paginator.get_paginated_data(data))
+
+    return await conditional(request, validators, respond)
+
+
+async def recipe_detail(request, pk):
+    validators = await recipe_state(request, Recipe.objects.filter(pk=pk))
+
+    async def respond():
+        instance = await get_or_404(recipes_for_reading(), pk=pk)
+        return json_response(await serialize_recipes(request, instance))
+
+    return await conditional(request, validators, respond)
+
+
+async def subscription_list(request):
+    if request.user.is_anonymous:
+        raise NotAuthenticated()
+    paginator = AsyncSubscriptionPagination()
+    if paginator.use_cursor(request):
+        return None
+    page = await paginator.apaginate_queryset(subscriptions_for(
+        request.user, request.query_params.get('recipes_limit')), request)
+    await aprefetch_membership(request, [SUBSCRIPTIONS])
+    data = ShowSubscriptionsSerializer(
+        page, many=True, context={'request': request}).data
+    return json_response(paginator.get_paginated_data(data))
+
+
+tags_view = read_view(tag_list, TagViewSet.as_view({'get': 'list'}))
+tag_view = read_view(tag_detail, TagViewSet.as_view({'get': 'retrieve'}))
+ingredients_view = read_view(
+    ingredient_list, IngredientViewSet.as_view({'get': 'list'}))
+ingredient_view = read_view(
+    ingredient_detail, IngredientViewSet.as_view({'get': 'retrieve'}))
+recipes_view = read_view(recipe_list, RecipeViewSet.as_view(
+    {'get': 'list', 'post': 'create'}))
+recipe_view = read_view(recipe_detail, RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
+subscriptions_view = read_view(
+    subscription_list, ShowSubscriptionsViewSet.as_view())
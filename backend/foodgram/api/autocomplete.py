@@ -0,0 +1,84 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from recipes.models import Ingredient
+from recipes.versions import INGREDIENTS_VERSION, get_version
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._built_at = 0.0
+        self._entries = ([], [])
+
+    def _is_stale(self, version):
+        return (
+            version != self._version
+            or time.monotonic() - self._built_at
+            > settings.INGREDIENT_INDEX_TTL
+        )
+
+    def _build(self, version):
+        items = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda item: (item['name'].casefold(), item['id'])
+        )
+        self._entries = ([item['name'].casefold() for item in items], items)
+        self._version = version
+        self._built_at = time.monotonic()
+
+    def refresh(self):
+        version = get_version(INGREDIENTS_VERSION)
+        if not self._is_stale(version):
+            return
+        with self._lock:
+            if self._is_stale(version):
+                self._build(version)
+
+    def warm(self):
+        try:
+            self.refresh()
+        except DatabaseError:
+            pass
+
+    def all(self):
+        self.refresh()
+        return self._entries[1]
+
+    def search(self, query, limit=None):
+        self.refresh()
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        keys, items = self._entries
+        query = query.strip().casefold()
+        if not query:
+            return items[:limit]
+
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_right(keys, query + chr(0x10FFFF), lo=start)
+        results = items[start:min(end, start + limit)]
+        if len(results) >= limit:
+            return results
+
+        word_start, substring = [], []
+        for position, key in enumerate(keys):
+            if start <= position < end:
+                continue
+            found = key.find(query)
+            if found == -1:
+                continue
+            if found == 0 or not key[found - 1].isalnum():
+                if len(word_start) < limit:
+                    word_start.append(items[position])
+            elif len(substring) < limit:
+                substring.append(items[position])
+        return (results + word_start + substring)[:limit]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,127 @@
+import csv
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.exceptions import APIException
+
+from recipes.models import ShoppingListItem
+from recipes.versions import cart_version_key, get_version
+
+TITLE = 'Список покупок'
+
+
+def shopping_list(user):
+    return ShoppingListItem.objects.filter(user=user).order_by(
+        'ingredient__name'
+    ).values_list(
+        'ingredient__name', 'total_amount', 'ingredient__measurement_unit'
+    )
+
+
+class ExportUnavailable(APIException):
+    status_code = 503
+    default_detail = 'Выгрузка в этом формате сейчас недоступна.'
+    default_code = 'export_unavailable'
+
+
+class Exporter:
+
+    def prepare(self):
+        """Проверки до начала потоковой передачи ответа."""
+
+
+class TextExporter(Exporter):
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def render(self, rows):
+        yield f'{TITLE}:\n'.encode()
+        for name, amount, unit in rows:
+            yield f'{name} - {amount} {unit}\n'.encode()
+
+
+class CsvExporter(Exporter):
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def render(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Ингредиент', 'Количество', 'Единицы измерения'])
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode()
+
+
+class PdfExporter(Exporter):
+    content_type = 'application/pdf'
+    extension = 'pdf'
+    font = 'ShoppingListFont'
+    font_size = 12
+    line_height = 18
+    margin = 50
+
+    def prepare(self):
+        # Шрифт загружается до ответа: ошибка внутри потока оборвала бы
+        # файл на середине.
+        if self.font in pdfmetrics.getRegisteredFontNames():
+            return
+        try:
+            font = TTFont(self.font, settings.SHOPPING_LIST_FONT)
+        except TTFError:
+            raise ExportUnavailable(
+                'Шрифт для PDF не найден, выберите type=csv или type=txt.')
+        pdfmetrics.registerFont(font)
+
+    def new_page(self, document):
+        document.setFont(self.font, self.font_size)
+        return A4[1] - self.margin
+
+    def render(self, rows):
+        buffer = io.BytesIO()
+        document = canvas.Canvas(buffer, pagesize=A4)
+        document.setTitle(TITLE)
+        y = self.new_page(document)
+        document.drawString(self.margin, y, f'{TITLE}:')
+        for number, (name, amount, unit) in enumerate(rows, start=1):
+            y -= self.line_height
+            if y < self.margin:
+                document.showPage()
+                y = self.new_page(document)
+            document.drawString(
+                self.margin, y, f'{number}. {name} - {amount} {unit}')
+        document.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(settings.EXPORT_CHUNK_SIZE), b'')
+
+
+EXPORTERS = {
+    'pdf': PdfExporter,
+    'csv': CsvExporter,
+    'txt': TextExporter,
+}
+
+
+def cache_stream(key, chunks):
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(parts), settings.SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+def export_shopping_list(user, exporter):
+    version = get_version(cart_version_key(user.id))
+    key = f'shopping-list:{user.id}:{exporter.extension}:{version}'
+    content = cache.get(key)
+    if content is not None:
+        return [content]
+    return cache_stream(key, exporter.render(shopping_list(user)))
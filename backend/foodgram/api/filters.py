@@ -1,24 +1,42 @@
+from django.db.models.functions import Lower
 from django_filters import rest_framework as filter
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Tag
+from recipes.models import Recipe
+from recipes.search import search_recipes
+from recipes.tag_masks import filter_by_tags, masks_by_slug
+
+TAGS_MATCH = (
+    ('any', 'Любой из тэгов'),
+    ('all', 'Все тэги'),
+)
 
 
 class RecipeFilter(filter.FilterSet):
     author = filter.CharFilter()
-    tags = filter.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        queryset=Tag.objects.all(),
+    tags = filter.MultipleChoiceFilter(
+        choices=lambda: [(slug, slug) for slug in masks_by_slug()],
         label='Tags',
-        to_field_name='slug'
+        method='get_tags'
     )
+    tags_match = filter.ChoiceFilter(choices=TAGS_MATCH,
+                                     method='get_tags_match')
     is_favorited = filter.BooleanFilter(method='get_favorite')
     is_in_shopping_cart = filter.BooleanFilter(
         method='get_is_in_shopping_cart')
+    search = filter.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
+        fields = ['tags', 'tags_match', 'author', 'is_favorited',
+                  'is_in_shopping_cart', 'search']
+
+    def get_tags(self, queryset, name, value):
+        match_all = self.form.cleaned_data.get('tags_match') == 'all'
+        return filter_by_tags(queryset, value, match_all)
+
+    def get_tags_match(self, queryset, name, value):
+        return queryset
 
     def get_favorite(self, queryset, name, value):
         if value:
@@ -30,6 +48,15 @@ class RecipeFilter(filter.FilterSet):
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
 
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
 
 class IngredientsFilter(SearchFilter):
     search_param = 'name'
+
+
+def filter_by_name_prefix(queryset, value):
+    """Префикс без учёта регистра через индекс по LOWER(name)."""
+    return queryset.alias(lower_name=Lower('name')).filter(
+        lower_name__startswith=value.lower())
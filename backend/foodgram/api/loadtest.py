@@ -0,0 +1,513 @@
+import asyncio
+import json
+import random
+import re
+import shlex
+import socket
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+from urllib.parse import quote, urlsplit
+
+PLACEHOLDER = re.compile(r'{{(\w+)}}')
+EXPECTED_STATUS = re.compile(r'должен быть (\d{3})')
+SETTER = re.compile(
+    r'pm\.collectionVariables\.set\(\s*["\'](\w+)["\']\s*,\s*([^;]+?)\)\s*;?$',
+    re.MULTILINE
+)
+CONSTANT = re.compile(
+    r'const (\w+) = _\.get\(responseData, "(\w+)"\)')
+ACCESSOR = re.compile(r'\[(\d+)\]|\.(\w+)')
+SLICE = re.compile(r'\.slice\((\d+),\s*(\d+)\)$')
+
+# Переменные с адресами и логинами получают суффикс виртуального
+# пользователя, чтобы регистрации не пересекались.
+UNIQUE_VARIABLES = (
+    'email', 'username', 'secondUserEmail', 'secondUserUsername',
+    'thirdUserEmail', 'thirdUserUsername',
+)
+
+
+class Step:
+    """Запрос коллекции с ожидаемым статусом и сохраняемыми переменными."""
+
+    def __init__(self, name, item, auth):
+        request = item['request']
+        self.name = name
+        self.method = request['method']
+        url = request['url']
+        self.url = url['raw'] if isinstance(url, dict) else url
+        self.body = (request.get('body') or {}).get('raw')
+        self.auth = request.get('auth') or auth
+        self.headers = {
+            header['key']: header['value']
+            for header in request.get('header', [])
+            if not header.get('disabled')
+        }
+        script = '\n'.join(
+            line for event in item.get('event', [])
+            if event['listen'] == 'test'
+            for line in event['script'].get('exec', [])
+        )
+        expected = EXPECTED_STATUS.search(script)
+        self.expected = int(expected.group(1)) if expected else None
+        self.setters = parse_setters(script)
+
+    @property
+    def uses(self):
+        text = ' '.join([self.url, self.body or '', json.dumps(self.auth)])
+        return set(PLACEHOLDER.findall(text))
+
+    @property
+    def sets(self):
+        return set(self.setters)
+
+    def authorization(self, variables):
+        if not self.auth or self.auth.get('type') != 'apikey':
+            return {}
+        options = {
+            option['key']: option['value']
+            for option in self.auth['apikey']
+        }
+        return {options.get('key', 'Authorization'):
+                substitute(options.get('value', ''), variables)}
+
+
+def parse_setters(script):
+    """Переменная -> путь к значению в JSON-ответе.
+
+    Понимает конструкции коллекции вида _.get(responseData, "id") и
+    responseData[0].name.slice(0,1).
+    """
+    constants = dict(CONSTANT.findall(script))
+    setters = {}
+    for name, expression in SETTER.findall(script):
+        expression = expression.strip()
+        if expression in constants:
+            setters[name] = ([constants[expression]], None)
+        elif expression.startswith('responseData'):
+            cut = SLICE.search(expression)
+            if cut:
+                expression = expression[:cut.start()]
+            path = [
+                int(index) if index else key
+                for index, key in ACCESSOR.findall(
+                    expression[len('responseData'):])
+            ]
+            setters[name] = (
+                path, (int(cut.group(1)), int(cut.group(2))) if cut else None)
+    return setters
+
+
+def extract(data, path, cut):
+    for key in path:
+        if isinstance(key, int):
+            if not isinstance(data, list) or len(data) <= key:
+                return None
+        elif not isinstance(data, dict):
+            return None
+        data = data[key] if isinstance(key, int) else data.get(key)
+    if cut and isinstance(data, str):
+        data = data[cut[0]:cut[1]]
+    return data
+
+
+def substitute(text, variables):
+    return PLACEHOLDER.sub(
+        lambda match: str(variables.get(match.group(1), match.group(0))),
+        text
+    )
+
+
+class Collection:
+    """Запросы Postman-коллекции, сгруппированные в сценарии по папкам."""
+
+    def __init__(self, data):
+        self.name = data['info']['name']
+        self.variables = {
+            variable['key']: variable['value']
+            for variable in data.get('variable', [])
+        }
+        self.steps = []
+        self.scenarios = {}
+        for folder in data['item']:
+            steps = list(self.walk(folder, folder.get('auth')))
+            self.scenarios[folder['name']] = steps
+            self.steps.extend(steps)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def walk(self, item, auth, prefix=''):
+        name = f'{prefix}{item["name"]}'
+        if 'item' not in item:
+            yield Step(name, item, auth)
+            return
+        for child in item['item']:
+            yield from self.walk(child, child.get('auth') or auth,
+                                 f'{name}/')
+
+    def provider(self, variable):
+        """Первый запрос коллекции, сохраняющий переменную."""
+        for step in self.steps:
+            if variable in step.sets:
+                return step
+        return None
+
+    def plan(self, steps, known):
+        """Сценарий с предварительными запросами для недостающих данных."""
+        planned = []
+        known = set(known)
+        for step in steps:
+            for variable in sorted(step.uses - known):
+                if variable not in known:
+                    self.require(variable, known, planned, set())
+            planned.append(step)
+            known |= step.sets
+        return planned
+
+    def require(self, variable, known, planned, visiting):
+        provider = self.provider(variable)
+        if provider is None or variable in visiting:
+            return
+        visiting.add(variable)
+        for dependency in sorted(provider.uses - known):
+            if dependency not in known:
+                self.require(dependency, known, planned, visiting)
+        planned.append(provider)
+        known |= provider.sets
+
+
+class Response:
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+    @property
+    def server_time(self):
+        """Значение total из Server-Timing в секундах."""
+        match = re.search(r'total;dur=([\d.]+)',
+                          self.headers.get('server-timing', ''))
+        return float(match.group(1)) / 1000 if match else None
+
+
+class Connection:
+    """Постоянное HTTP/1.1-соединение виртуального пользователя."""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def request(self, method, target, headers, body):
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(
+                    self.host, self.port)
+            try:
+                return await asyncio.wait_for(
+                    self.exchange(method, target, headers, body),
+                    self.timeout
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Сервер мог закрыть простаивающее соединение.
+                self.close()
+                if attempt:
+                    raise
+            except BaseException:
+                self.close()
+                raise
+
+    async def exchange(self, method, target, headers, body):
+        lines = [f'{method} {target} HTTP/1.1',
+                 f'Host: {self.host}:{self.port}']
+        lines += [f'{key}: {value}' for key, value in headers.items()]
+        lines.append(f'Content-Length: {len(body)}')
+        self.writer.write(
+            ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = (await self.reader.readuntil(b'\r\n')).decode('latin-1')
+            if line == '\r\n':
+                break
+            key, _, value = line.partition(':')
+            response_headers[key.strip().lower()] = value.strip()
+        if response_headers.get('transfer-encoding') == 'chunked':
+            content = await self.read_chunked()
+        elif 'content-length' in response_headers:
+            content = await self.reader.readexactly(
+                int(response_headers['content-length']))
+        elif status in (204, 304) or method == 'HEAD':
+            content = b''
+        else:
+            content = await self.reader.read()
+            self.close()
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return Response(status, response_headers, content)
+
+    async def read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0],
+                       16)
+            if not size:
+                await self.reader.readuntil(b'\r\n')
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Stats:
+    """Результаты одного запроса коллекции."""
+
+    def __init__(self):
+        self.latencies = []
+        self.server = []
+        self.statuses = defaultdict(int)
+        self.errors = 0
+        self.unexpected = 0
+
+    def add(self, step, latency, response=None):
+        self.latencies.append(latency)
+        if response is None:
+            self.errors += 1
+            self.statuses['error'] += 1
+            return
+        self.statuses[response.status] += 1
+        if response.status >= 500:
+            self.errors += 1
+        elif step.expected and response.status != step.expected:
+            self.unexpected += 1
+        if response.server_time is not None:
+            self.server.append(response.server_time)
+
+    def summary(self, elapsed):
+        count = len(self.latencies)
+        latencies = sorted(self.latencies)
+        result = {
+            'requests': count,
+            'rps': round(count / elapsed, 2) if elapsed else 0,
+            'error_rate': round(self.errors / count, 4) if count else 0,
+            'unexpected_rate': (
+                round(self.unexpected / count, 4) if count else 0),
+            'statuses': {
+                str(status): total
+                for status, total in sorted(self.statuses.items(), key=str)
+            },
+        }
+        for percentile in (50, 95, 99):
+            result[f'p{percentile}_ms'] = round(
+                percentile_of(latencies, percentile) * 1000, 2)
+        result['server_p50_ms'] = round(
+            statistics.median(self.server) * 1000, 2) if self.server else None
+        return result
+
+
+def percentile_of(values, percentile):
+    if not values:
+        return 0
+    return values[round(percentile / 100 * (len(values) - 1))]
+
+
+class VirtualUser:
+    """Выполняет сценарии коллекции от имени своего набора пользователей."""
+
+    def __init__(self, runner, number):
+        self.runner = runner
+        self.number = number
+        self.rng = random.Random(runner.seed * 100003 + number)
+        self.variables = dict(runner.collection.variables)
+        suffix = f'lt{runner.seed}-{number}'
+        for name in UNIQUE_VARIABLES:
+            if name in self.variables:
+                self.variables[name] = unique(self.variables[name], suffix)
+        # Переменные, которые сервер не вернул: повторять их запросы
+        # перед каждым сценарием бессмысленно.
+        self.unavailable = set()
+        self.connection = Connection(runner.host, runner.port,
+                                     runner.timeout)
+
+    async def run(self, stop_at):
+        runner = self.runner
+        try:
+            for name in runner.setup:
+                await self.execute(runner.collection.scenarios[name])
+            iterations = 0
+            while time.monotonic() < stop_at and (
+                    not runner.iterations or iterations < runner.iterations):
+                name = self.rng.choices(runner.names, runner.weights)[0]
+                await self.execute(runner.collection.scenarios[name])
+                iterations += 1
+        finally:
+            self.connection.close()
+
+    async def execute(self, steps):
+        known = set(self.variables) | self.unavailable
+        for step in self.runner.collection.plan(steps, known):
+            await self.send(step)
+
+    async def send(self, step):
+        variables = self.variables
+        target = urlsplit(substitute(step.url, variables))
+        path = quote(target.path or '/', safe='/%:@')
+        if target.query:
+            path += '?' + quote(target.query, safe='=&%:+,/')
+        headers = {'Accept': 'application/json'}
+        headers.update(step.authorization(variables))
+        headers.update({key: substitute(value, variables)
+                        for key, value in step.headers.items()})
+        body = b''
+        if step.body:
+            headers['Content-Type'] = 'application/json'
+            body = substitute(step.body, variables).encode('utf-8')
+
+        started = time.perf_counter()
+        try:
+            response = await self.connection.request(
+                step.method, path, headers, body)
+        except (OSError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError, ValueError):
+            self.runner.record(step, time.perf_counter() - started)
+            return
+        self.runner.record(step, time.perf_counter() - started, response)
+
+        if step.setters:
+            data = response.json() if response.status < 400 else None
+            for name, (keys, cut) in step.setters.items():
+                value = extract(data, keys, cut)
+                if value is None:
+                    self.unavailable.add(name)
+                else:
+                    variables[name] = value
+                    self.unavailable.discard(name)
+        if step.method == 'DELETE' and response.status == 204:
+            # Удалённый объект больше нельзя использовать в сценариях.
+            deleted = re.search(r'{{(\w+)}}/?$', step.url)
+            if deleted:
+                variables.pop(deleted.group(1), None)
+
+
+def unique(value, suffix):
+    """Добавляет суффикс к логину или к имени ящика в адресе."""
+    quoted = value.startswith('"') and value.endswith('"')
+    text = value[1:-1] if quoted else value
+    local, at, domain = text.partition('@')
+    text = f'{local}-{suffix}{at}{domain}'
+    return f'"{text}"' if quoted else text
+
+
+class LoadRunner:
+
+    def __init__(self, collection, base_url, users, ramp_up, duration,
+                 iterations=0, weights=None, setup=(), timeout=30, seed=0):
+        self.collection = collection
+        address = urlsplit(base_url)
+        self.host = address.hostname
+        self.port = address.port or 80
+        # Адреса запросов относительные: хост задаётся соединением.
+        collection.variables['baseUrl'] = ''
+        self.users = users
+        self.ramp_up = ramp_up
+        self.duration = duration
+        self.iterations = iterations
+        self.setup = list(setup)
+        weights = weights or {}
+        self.names = [
+            name for name in collection.scenarios
+            if weights.get(name, 0 if name in self.setup else 1) > 0
+        ]
+        self.weights = [
+            weights.get(name, 1) for name in self.names
+        ]
+        self.timeout = timeout
+        self.seed = seed
+        self.stats = defaultdict(Stats)
+        self.timeline = defaultdict(int)
+
+    def record(self, step, latency, response=None):
+        self.stats[step.name].add(step, latency, response)
+        self.timeline[int(time.monotonic() - self.started)] += 1
+
+    async def start_user(self, number, stop_at):
+        if self.users > 1:
+            await asyncio.sleep(self.ramp_up * number / self.users)
+        await VirtualUser(self, number).run(stop_at)
+
+    async def run(self):
+        self.started = time.monotonic()
+        stop_at = self.started + self.ramp_up + self.duration
+        results = await asyncio.gather(
+            *(self.start_user(number, stop_at)
+              for number in range(self.users)),
+            return_exceptions=True
+        )
+        self.elapsed = time.monotonic() - self.started
+        return [result for result in results
+                if isinstance(result, BaseException)]
+
+    def report(self):
+        total = Stats()
+        requests = {}
+        for name, stats in self.stats.items():
+            requests[name] = stats.summary(self.elapsed)
+            total.latencies += stats.latencies
+            total.server += stats.server
+            total.errors += stats.errors
+            total.unexpected += stats.unexpected
+            for status, count in stats.statuses.items():
+                total.statuses[status] += count
+        return {
+            'collection': self.collection.name,
+            'users': self.users,
+            'ramp_up': self.ramp_up,
+            'duration': round(self.elapsed, 2),
+            'scenarios': dict(zip(self.names, self.weights)),
+            'total': total.summary(self.elapsed),
+            'timeline': [self.timeline[second]
+                         for second in range(int(self.elapsed) + 1)],
+            'requests': requests,
+        }
+
+
+class ServerError(Exception):
+    pass
+
+
+def start_server(command, base_url, cwd, env=None, timeout=30):
+    """Запускает сервер и ждёт, пока он начнёт принимать соединения."""
+    address = urlsplit(base_url)
+    server = subprocess.Popen(shlex.split(command), cwd=cwd, env=env)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise ServerError('Сервер завершился при запуске.')
+        try:
+            socket.create_connection(
+                (address.hostname, address.port or 80), 1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise ServerError('Сервер не начал принимать соединения.')
@@ -0,0 +1,288 @@
+import io
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.versions import RECIPES_VERSION, TAGS_VERSION, bump_versions
+from users.models import User
+
+# Предельное число SQL-запросов на один запрос к API.
+BUDGETS = {
+    'tags-list': 1,
+    'ingredients-search': 1,
+    'recipes-list': 5,
+    'recipes-list-anonymous': 5,
+    'recipes-list-304': 1,
+    'recipes-list-cursor': 3,
+    'recipes-by-tags': 5,
+    'recipes-by-all-tags': 5,
+    'recipes-by-author': 5,
+    'recipes-favorited': 5,
+    'recipes-in-cart': 5,
+    'recipes-search': 5,
+    'recipes-combined-filters': 5,
+    'recipes-by-popularity': 5,
+    'recipes-detail': 4,
+    'subscriptions': 3,
+    'users-list': 2,
+    'users-me': 1,
+    'download-txt': 2,
+    'download-csv': 2,
+    'download-pdf': 2,
+    'recipe-create': 11,
+    'recipe-update': 10,
+    'recipe-patch-text': 6,
+    'favorite-add': 4,
+    'favorite-remove': 4,
+    'cart-add': 10,
+    'cart-remove': 9,
+    'subscribe': 1,
+    'unsubscribe': 1,
+    'cart-bulk-add': 9,
+    'cart-bulk-remove': 8,
+}
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет маршруты API через тестовый клиент на фиксированном '
+            'наборе данных и сверяет число SQL-запросов с бюджетами. '
+            'Данные создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=20)
+        parser.add_argument('--output', help='файл для отчёта в JSON')
+        parser.add_argument('--only', help='имена сценариев через запятую')
+
+    def handle(self, *args, **options):
+        if not Ingredient.objects.exists():
+            raise CommandError('Сначала загрузите ингредиенты: import_data.')
+        # Откат транзакции не удаляет загруженные картинки, поэтому они
+        # пишутся во временный каталог.
+        media_root = tempfile.mkdtemp()
+        try:
+            with transaction.atomic(), override_settings(
+                    ALLOWED_HOSTS=['testserver'], MEDIA_ROOT=media_root):
+                self.seed(options)
+                report = self.run(options)
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+        bump_versions([RECIPES_VERSION, TAGS_VERSION])
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        exceeded = [
+            name for name, result in report['endpoints'].items()
+            if not result['ok']
+        ]
+        if exceeded:
+            raise CommandError(
+                f'Превышен бюджет или ошибка ответа: {", ".join(exceeded)}.')
+
+    def seed(self, options):
+        call_command(
+            'generate_data', users=options['users'],
+            recipes=options['recipes'], favorites=options['recipes'] * 3,
+            carts=options['users'] * 3, subscriptions=options['users'] * 5,
+            seed=options['seed'], stdout=io.StringIO()
+        )
+        self.user = User.objects.filter(
+            email__startswith=f'gen{options["seed"]}-'
+        ).order_by('-recipes_count').first()
+        self.user.is_staff = True
+        self.user.save(update_fields=['is_staff'])
+        self.author = User.objects.exclude(pk=self.user.pk).filter(
+            recipes_count__gt=0).exclude(author__user=self.user).first()
+        self.recipe = Recipe.objects.filter(author=self.user).first()
+        self.target = Recipe.objects.exclude(
+            favorites__user=self.user).exclude(
+            shopping_cart__user=self.user).first()
+        self.ingredients = list(Ingredient.objects.values_list(
+            'id', flat=True)[:10])
+        self.tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.anonymous = APIClient()
+
+    def scenarios(self):
+        tags = '&'.join(f'tags={slug}' for slug in self.tags)
+        recipe_body = {
+            'ingredients': [{'id': pk, 'amount': 10}
+                            for pk in self.ingredients[:5]],
+            'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'image': ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAA'
+                      'AABAQMAAAAl21bKAAAAA1BMVEUAAACnej3aAAAAAXRSTlMAQObYZg'
+                      'AAAApJREFUCNdjYAAAAAIAAeIhvDMAAAAASUVORK5CYII='),
+            'name': 'Бенчмарк',
+            'text': 'Текст',
+            'cooking_time': 10,
+        }
+        update_body = dict(recipe_body, ingredients=[
+            {'id': pk, 'amount': 20} for pk in self.ingredients[3:8]])
+        recipe = f'/api/recipes/{self.target.pk}'
+        author = f'/api/users/{self.author.pk}'
+        reads = [
+            ('tags-list', 'get', '/api/tags/'),
+            ('ingredients-search', 'get', '/api/ingredients/?name=сах'),
+            ('recipes-list', 'get', '/api/recipes/'),
+            ('recipes-list-cursor', 'get', '/api/recipes/?pagination=cursor'),
+            ('recipes-by-tags', 'get', f'/api/recipes/?{tags}'),
+            ('recipes-by-all-tags', 'get',
+             f'/api/recipes/?{tags}&tags_match=all'),
+            ('recipes-by-author', 'get',
+             f'/api/recipes/?author={self.author.pk}'),
+            ('recipes-favorited', 'get', '/api/recipes/?is_favorited=1'),
+            ('recipes-in-cart', 'get', '/api/recipes/?is_in_shopping_cart=1'),
+            ('recipes-search', 'get', '/api/recipes/?search=домашний'),
+            ('recipes-combined-filters', 'get',
+             f'/api/recipes/?{tags}&is_favorited=1&search=суп'),
+            ('recipes-by-popularity', 'get',
+             '/api/recipes/?ordering=-favorites_count'),
+            ('recipes-detail', 'get', f'{recipe}/'),
+            ('subscriptions', 'get',
+             '/api/users/subscriptions/?recipes_limit=3'),
+            ('users-list', 'get', '/api/users/'),
+            ('users-me', 'get', '/api/users/me/'),
+            ('download-txt', 'get',
+             '/api/recipes/download_shopping_cart/?type=txt'),
+            ('download-csv', 'get',
+             '/api/recipes/download_shopping_cart/?type=csv'),
+        ]
+        if os.path.exists(settings.SHOPPING_LIST_FONT):
+            reads.append(('download-pdf', 'get',
+                          '/api/recipes/download_shopping_cart/?type=pdf'))
+        scenarios = [[(name, method, path, None)]
+                     for name, method, path in reads]
+        scenarios += [
+            [('recipes-list-anonymous', 'get', '/api/recipes/', None)],
+            [('recipes-list-304', 'get', '/api/recipes/', 'etag')],
+            [('recipe-create', 'post', '/api/recipes/', recipe_body)],
+            [('recipe-update', 'put', f'/api/recipes/{self.recipe.pk}/',
+              update_body),
+             ('recipe-patch-text', 'patch',
+              f'/api/recipes/{self.recipe.pk}/', {'text': 'Исправлено'})],
+            [('favorite-add', 'post', f'{recipe}/favorite/', None),
+             ('favorite-remove', 'delete', f'{recipe}/favorite/', None)],
+            [('cart-add', 'post', f'{recipe}/shopping_cart/', None),
+             ('cart-remove', 'delete', f'{recipe}/shopping_cart/', None)],
+            [('subscribe', 'post', f'{author}/subscribe/', None),
+             ('unsubscribe', 'delete', f'{author}/subscribe/', None)],
+            [('cart-bulk-add', 'post', '/api/recipes/shopping_cart/',
+              {'ids': self.bulk_ids()}),
+             ('cart-bulk-remove', 'delete', '/api/recipes/shopping_cart/',
+              {'ids': self.bulk_ids()})],
+        ]
+        return scenarios
+
+    def bulk_ids(self):
+        return list(Recipe.objects.exclude(
+            shopping_cart__user=self.user).values_list('pk', flat=True)[:7])
+
+    def client_for(self, name):
+        return self.anonymous if name.endswith('anonymous') else self.client
+
+    def prepare(self, step):
+        """Заголовки запроса; для сценария 304 - ETag свежего ответа."""
+        name, method, path, body = step
+        if body == 'etag':
+            return {'HTTP_IF_NONE_MATCH': self.client_for(name).get(path)[
+                'ETag']}
+        return {}
+
+    def request(self, step, headers):
+        name, method, path, body = step
+        response = getattr(self.client_for(name), method)(
+            path, None if body == 'etag' else body, format='json', **headers)
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        return response
+
+    def run(self, options):
+        only = set(options['only'].split(',')) if options['only'] else None
+        samples = {}
+        for scenario in self.scenarios():
+            steps = [step for step in scenario
+                     if only is None or step[0] in only]
+            if not steps:
+                continue
+            for _ in range(options['warmup']):
+                for step in steps:
+                    self.request(step, self.prepare(step))
+            for _ in range(options['iterations']):
+                for step in steps:
+                    samples.setdefault(step[0], []).append(
+                        self.measure(step))
+            tracemalloc.start()
+            for step in steps:
+                headers = self.prepare(step)
+                tracemalloc.reset_peak()
+                self.request(step, headers)
+                samples[step[0]][-1]['memory'] = (
+                    tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        endpoints = {}
+        for name, results in samples.items():
+            timings = sorted(result['time'] for result in results)
+            queries = max(result['queries'] for result in results)
+            statuses = sorted({result['status'] for result in results})
+            budget = BUDGETS.get(name)
+            endpoints[name] = {
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(
+                    timings[round(0.95 * (len(timings) - 1))], 2),
+                'queries': queries,
+                'budget': budget,
+                'memory_kib': round(results[-1].get('memory', 0) / 1024),
+                'statuses': statuses,
+                'ok': (budget is None or queries <= budget)
+                and all(status < 400 for status in statuses),
+            }
+        return {
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'recipes': options['recipes'],
+            'users': options['users'],
+            'endpoints': endpoints,
+        }
+
+    def measure(self, step):
+        headers = self.prepare(step)
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = self.request(step, headers)
+            elapsed = (time.perf_counter() - started) * 1000
+        return {'time': elapsed, 'queries': len(context.captured_queries),
+                'status': response.status_code}
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{"endpoint":<26} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"queries":>8} {"budget":>7} {"KiB":>7}  status')
+        for name, result in report['endpoints'].items():
+            line = (
+                f'{name:<26} {result["p50_ms"]:>8} {result["p95_ms"]:>8} '
+                f'{result["queries"]:>8} {str(result["budget"]):>7} '
+                f'{result["memory_kib"]:>7}  '
+                f'{",".join(map(str, result["statuses"]))}'
+            )
+            self.stdout.write(line if result['ok']
+                              else self.style.ERROR(line))
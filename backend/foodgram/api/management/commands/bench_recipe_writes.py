@@ -0,0 +1,100 @@
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from recipes.models import Ingredient, Tag
+from users.models import User
+
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAQMAAAAl21'
+         'bKAAAAA1BMVEUAAACnej3aAAAAAXRSTlMAQObYZgAAAApJREFUCNdjYAAAAAIAAeI'
+         'hvDMAAAAASUVORK5CYII=')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет число запросов и время создания и изменения рецепта '
+            'в зависимости от числа ингредиентов. Изменения откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,40,100',
+                            help='число ингредиентов через запятую')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        ingredients = list(Ingredient.objects.values_list(
+            'id', flat=True)[:sizes[-1] * 2])
+        if len(ingredients) < sizes[-1] * 2:
+            raise CommandError(
+                f'Нужно хотя бы {sizes[-1] * 2} ингредиентов в базе.')
+        tags = list(Tag.objects.values_list('id', flat=True)[:3])
+        self.factory = APIRequestFactory()
+        self.stdout.write(
+            f'{"ingredients":>12} {"create q":>9} {"create ms":>10} '
+            f'{"update q":>9} {"update ms":>10}')
+        # Откат транзакции не удаляет загруженные картинки, поэтому они
+        # пишутся во временный каталог.
+        media_root = tempfile.mkdtemp()
+        try:
+            with transaction.atomic(), override_settings(
+                    MEDIA_ROOT=media_root):
+                self.user = User.objects.create(
+                    username='bench', email='bench-writes@example.com',
+                    first_name='bench', last_name='bench', is_staff=True
+                )
+                for size in sizes:
+                    created, updated = [], []
+                    for _ in range(options['repeat']):
+                        body = self.body(ingredients[:size], tags)
+                        response, queries, elapsed = self.run(
+                            'post', 'create', body)
+                        created.append((queries, elapsed))
+                        body = self.body(ingredients[size:size * 2], tags)
+                        _, queries, elapsed = self.run(
+                            'put', 'update', body, response.data['id'])
+                        updated.append((queries, elapsed))
+                    self.stdout.write(
+                        f'{size:>12} {self.summary(created)} '
+                        f'{self.summary(updated)}')
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def body(self, ingredients, tags):
+        return {
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in ingredients
+            ],
+            'tags': tags,
+            'image': IMAGE,
+            'name': 'bench',
+            'text': 'bench',
+            'cooking_time': 10,
+        }
+
+    def run(self, method, action, body, pk=None):
+        request = getattr(self.factory, method)('/api/recipes/', body,
+                                                format='json')
+        force_authenticate(request, self.user)
+        view = RecipeViewSet.as_view({method: action})
+        kwargs = {'pk': pk} if pk else {}
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = view(request, **kwargs)
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise CommandError(f'{method.upper()}: {response.data}')
+        return response, len(context.captured_queries), elapsed
+
+    @staticmethod
+    def summary(results):
+        queries = max(queries for queries, _ in results)
+        elapsed = statistics.median(elapsed for _, elapsed in results)
+        return f'{queries:>9} {elapsed:>10.1f}'
@@ -0,0 +1,104 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import Ingredient, Recipe, RecipeIngredients
+from recipes.search import search_recipes, update_search_vector
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку поиска рецептов по мере роста таблицы. '
+            'Тестовые данные создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='размеры таблицы через запятую')
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stderr.write(self.style.WARNING(
+                'База данных не PostgreSQL: замеряется поиск через icontains.'
+            ))
+        ingredients = list(Ingredient.objects.values_list('id', 'name'))
+        if not ingredients:
+            raise CommandError('Сначала загрузите ингредиенты.')
+        self.rng = random.Random(options['seed'])
+        self.ingredients = ingredients
+        self.words = sorted({
+            word for _, name in ingredients
+            for word in name.split() if len(word) > 3
+        })
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+
+        self.stdout.write(f'{"recipes":>10} {"p50, ms":>10} {"p95, ms":>10}')
+        with transaction.atomic():
+            author = User.objects.create(
+                username='bench', email='bench-search@example.com',
+                first_name='bench', last_name='bench'
+            )
+            total = Recipe.objects.count()
+            for size in sizes:
+                while total < size:
+                    batch = min(options['batch_size'], size - total)
+                    self.create_recipes(author, batch)
+                    total += batch
+                self.analyze()
+                timings = self.measure(options['queries'],
+                                       options['limit'])
+                self.stdout.write(
+                    f'{total:>10} {statistics.median(timings):>10.2f} '
+                    f'{self.percentile(timings, 95):>10.2f}'
+                )
+            transaction.set_rollback(True)
+
+    def create_recipes(self, author, count):
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author=author,
+                name=' '.join(self.rng.sample(self.words, 3)),
+                text=' '.join(self.rng.choices(self.words, k=30)),
+                cooking_time=self.rng.randint(5, 180),
+                image='recipes/images/bench.png',
+            )
+            for _ in range(count)
+        ])
+        RecipeIngredients.objects.bulk_create([
+            RecipeIngredients(recipe=recipe, ingredient_id=ingredient_id,
+                              amount=self.rng.randint(1, 500))
+            for recipe in recipes
+            for ingredient_id, _ in self.rng.sample(self.ingredients, 5)
+        ])
+        update_search_vector([recipe.pk for recipe in recipes])
+
+    def analyze(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Recipe._meta.db_table}')
+
+    def measure(self, queries, limit):
+        timings = []
+        for _ in range(queries):
+            term = self.rng.choice(self.words)
+            if self.rng.random() < 0.3:
+                position = self.rng.randrange(len(term) - 1)
+                term = (term[:position] + term[position + 1]
+                        + term[position] + term[position + 2:])
+            started = time.perf_counter()
+            list(search_recipes(Recipe.objects.all(), term)
+                 .values_list('pk', flat=True)[:limit])
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    @staticmethod
+    def percentile(values, percent):
+        values = sorted(values)
+        index = round(percent / 100 * (len(values) - 1))
+        return values[index]
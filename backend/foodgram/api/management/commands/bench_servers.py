@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadtest import Connection, ServerError, percentile_of, start_server
+from recipes.models import Recipe
+
+PROFILES = ('wsgi', 'asgi')
+
+
+def tree_rss(pid):
+    """Резидентная память процесса и всех его потомков в байтах."""
+    children = {}
+    for entry in Path('/proc').iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / 'stat').read_text()
+        except OSError:
+            continue
+        parent = int(stat.rsplit(')', 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry.name))
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending += children.get(current, [])
+        try:
+            status = Path(f'/proc/{current}/status').read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith('VmRSS:'):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает профили сервера wsgi (синхронные воркеры gunicorn) '
+            'и asgi (воркеры uvicorn с асинхронным чтением) под одинаковой '
+            'нагрузкой: N постоянных соединений запрашивают маршруты '
+            'чтения. Печатает запросы в секунду, задержки и прирост '
+            'памяти сервера на одно соединение.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default=','.join(PROFILES))
+        parser.add_argument('--connections', default='10,50,200',
+                            help='числа соединений через запятую')
+        parser.add_argument('--duration', type=float, default=20,
+                            help='секунды нагрузки на каждый уровень')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--bind', default='127.0.0.1:8765')
+        parser.add_argument('--token', help='токен для маршрутов с входом')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output', help='файл для отчёта в JSON')
+
+    def handle(self, *args, **options):
+        profiles = options['profiles'].split(',')
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные профили: {", ".join(sorted(unknown))}.')
+        recipe = Recipe.objects.values_list('pk', flat=True).first()
+        if recipe is None:
+            raise CommandError('Сначала создайте данные: generate_data.')
+        self.paths = [
+            '/api/recipes/',
+            '/api/recipes/?limit=20',
+            f'/api/recipes/{recipe}/',
+            '/api/tags/',
+            f'/api/ingredients/?name={quote("са")}',
+        ]
+        self.headers = {}
+        if options['token']:
+            self.headers['Authorization'] = f'Token {options["token"]}'
+            self.paths.append('/api/users/subscriptions/?recipes_limit=3')
+        levels = [int(value) for value in options['connections'].split(',')]
+
+        report = {'workers': options['workers'], 'paths': self.paths,
+                  'profiles': {}}
+        for profile in profiles:
+            report['profiles'][profile] = self.bench_profile(
+                profile, levels, options)
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def bench_profile(self, profile, levels, options):
+        host, _, port = options['bind'].rpartition(':')
+        env = dict(
+            os.environ, SERVER_PROFILE=profile,
+            ALLOWED_HOSTS=f'{os.getenv("ALLOWED_HOSTS", "localhost")} {host}'
+        )
+        command = (f'gunicorn -c gunicorn.conf.py --bind {options["bind"]} '
+                   f'--workers {options["workers"]}')
+        try:
+            server = start_server(command, f'http://{options["bind"]}',
+                                  settings.BASE_DIR, env)
+        except ServerError as error:
+            raise CommandError(f'{profile}: {error}')
+        try:
+            # Прогрев: воркеры импортируют приложение и строят кэши.
+            asyncio.run(self.load(host, int(port), 4, 2, options, server))
+            idle = tree_rss(server.pid)
+            results = {}
+            for connections in levels:
+                result = asyncio.run(self.load(
+                    host, int(port), connections, options['duration'],
+                    options, server))
+                result['rss_idle_mib'] = round(idle / 2 ** 20, 1)
+                result['kib_per_connection'] = round(
+                    max(0, result.pop('rss_peak') - idle) / connections
+                    / 1024, 1)
+                results[connections] = result
+        finally:
+            server.terminate()
+            server.wait()
+        return results
+
+    async def load(self, host, port, connections, duration, options,
+                   server):
+        latencies, statuses, errors = [], {}, 0
+        stop_at = time.monotonic() + duration
+        peak = 0
+
+        async def client(number):
+            nonlocal errors
+            connection = Connection(host, port, options['timeout'])
+            index = number
+            try:
+                while time.monotonic() < stop_at:
+                    path = self.paths[index % len(self.paths)]
+                    index += 1
+                    started = time.perf_counter()
+                    try:
+                        response = await connection.request(
+                            'GET', path, self.headers, b'')
+                    except (OSError, asyncio.TimeoutError,
+                            asyncio.IncompleteReadError, ValueError):
+                        errors += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+                    statuses[response.status] = (
+                        statuses.get(response.status, 0) + 1)
+                    if response.status >= 500:
+                        errors += 1
+            finally:
+                connection.close()
+
+        async def sample():
+            nonlocal peak
+            while time.monotonic() < stop_at:
+                peak = max(peak, tree_rss(server.pid))
+                await asyncio.sleep(0.5)
+
+        started = time.monotonic()
+        await asyncio.gather(sample(), *(client(number)
+                                         for number in range(connections)))
+        elapsed = time.monotonic() - started
+        latencies.sort()
+        requests = len(latencies)
+        return {
+            'requests': requests,
+            'rps': round(requests / elapsed, 1),
+            'p50_ms': round(percentile_of(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile_of(latencies, 95) * 1000, 1),
+            'errors': errors,
+            'statuses': statuses,
+            'rss_peak': peak,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{"profile":<8} {"conn":>6} {"rps":>9} {"p50 ms":>8} '
+            f'{"p95 ms":>8} {"errors":>7} {"idle MiB":>9} {"KiB/conn":>9}')
+        for profile, results in report['profiles'].items():
+            for connections, result in results.items():
+                line = (
+                    f'{profile:<8} {connections:>6} {result["rps"]:>9} '
+                    f'{result["p50_ms"]:>8} {result["p95_ms"]:>8} '
+                    f'{result["errors"]:>7} {result["rss_idle_mib"]:>9} '
+                    f'{result["kib_per_connection"]:>9}'
+                )
+                self.stdout.write(self.style.ERROR(line) if result['errors']
+                                  else line)
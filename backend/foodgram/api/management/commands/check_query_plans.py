@@ -0,0 +1,155 @@
+import io
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.filters import filter_by_name_prefix
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.versions import RECIPES_VERSION, TAGS_VERSION, bump_versions
+from users.models import User
+
+# Таблицы в десятки строк: полный просмотр для них дешевле индекса.
+SMALL_TABLES = {'recipes_tag'}
+
+# Сценарий -> таблицы, где полный просмотр ожидаем, и причина.
+ALLOWED_SEQ_SCANS = {}
+
+SCAN_NODES = {'Seq Scan', 'Parallel Seq Scan'}
+
+
+class Command(BaseCommand):
+    help = ('Снимает EXPLAIN для запросов основных списков API на '
+            'сгенерированных данных и завершается ошибкой, если какой-то '
+            'из них читает большую таблицу полным просмотром. Планы '
+            'строятся с enable_seqscan = off: оставшийся Seq Scan значит, '
+            'что подходящего индекса нет. Данные откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=23)
+        parser.add_argument('--output', help='файл для отчёта в JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Планы проверяются только на PostgreSQL.')
+        if not Ingredient.objects.exists():
+            raise CommandError('Сначала загрузите ингредиенты: import_data.')
+        with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=['testserver']):
+            self.seed(options)
+            report = self.run()
+            transaction.set_rollback(True)
+        bump_versions([RECIPES_VERSION, TAGS_VERSION])
+
+        failed = [name for name, result in report.items()
+                  if result['violations']]
+        for name, result in report.items():
+            line = f'{name:<24} запросов {len(result["queries"]):>2}'
+            if result['violations']:
+                self.stdout.write(self.style.ERROR(
+                    f'{line}  Seq Scan: {", ".join(result["violations"])}'))
+            else:
+                self.stdout.write(line)
+            if options['verbosity'] > 1:
+                for query in result['queries']:
+                    self.stdout.write(f'  {query["sql"]}')
+                    self.stdout.write(json.dumps(
+                        query['plan'], ensure_ascii=False, indent=2))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if failed:
+            raise CommandError(
+                f'Полный просмотр больших таблиц: {", ".join(failed)}.')
+
+    def seed(self, options):
+        call_command(
+            'generate_data', users=options['users'],
+            recipes=options['recipes'], favorites=options['recipes'] * 3,
+            carts=options['users'] * 3, subscriptions=options['users'] * 5,
+            seed=options['seed'], stdout=io.StringIO()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.user = User.objects.filter(
+            email__startswith=f'gen{options["seed"]}-'
+        ).order_by('-recipes_count').first()
+        self.author = User.objects.exclude(pk=self.user.pk).filter(
+            recipes_count__gt=0).first()
+        self.recipe = Recipe.objects.filter(author=self.author).first()
+        self.ingredient = Ingredient.objects.order_by('pk').first()
+        self.tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def scenarios(self):
+        tags = '&'.join(f'tags={slug}' for slug in self.tags)
+        prefix = self.ingredient.name[:3]
+        requests = [
+            ('recipes-list', '/api/recipes/'),
+            ('recipes-detail', f'/api/recipes/{self.recipe.pk}/'),
+            ('recipes-by-author', f'/api/recipes/?author={self.author.pk}'),
+            ('recipes-by-tags', f'/api/recipes/?{tags}'),
+            ('recipes-by-all-tags', f'/api/recipes/?{tags}&tags_match=all'),
+            ('recipes-favorited', '/api/recipes/?is_favorited=1'),
+            ('recipes-in-cart', '/api/recipes/?is_in_shopping_cart=1'),
+            ('ingredients-detail',
+             f'/api/ingredients/{self.ingredient.pk}/'),
+            ('subscriptions', '/api/users/subscriptions/?recipes_limit=3'),
+        ]
+        scenarios = [
+            (name, lambda path=path: self.client.get(path))
+            for name, path in requests
+        ]
+        # Список ингредиентов отдаётся из индекса в памяти, в базу по
+        # префиксу ходит только его построение вне запроса.
+        scenarios.append(('ingredients-prefix', lambda: list(
+            filter_by_name_prefix(Ingredient.objects.all(), prefix))))
+        return scenarios
+
+    def run(self):
+        report = {}
+        for name, scenario in self.scenarios():
+            queries = []
+
+            def capture(execute, sql, params, many, context):
+                if sql.lstrip().upper().startswith('SELECT'):
+                    queries.append((sql, params))
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(capture):
+                response = scenario()
+            status = getattr(response, 'status_code', 200)
+            if status >= 400:
+                raise CommandError(f'{name}: ответ {status}.')
+            report[name] = self.explain(name, queries)
+        return report
+
+    def explain(self, name, queries):
+        allowed = ALLOWED_SEQ_SCANS.get(name, {})
+        result = {'queries': [], 'violations': []}
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for sql, params in queries:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0][0]['Plan']
+                result['queries'].append({'sql': sql, 'plan': plan})
+                for table in seq_scans(plan):
+                    if table not in SMALL_TABLES and table not in allowed:
+                        result['violations'].append(table)
+            cursor.execute('SET LOCAL enable_seqscan = on')
+        result['violations'] = sorted(set(result['violations']))
+        return result
+
+
+def seq_scans(plan):
+    """Таблицы, которые узлы плана читают полным просмотром."""
+    if plan['Node Type'] in SCAN_NODES:
+        yield plan['Relation Name']
+    for child in plan.get('Plans', []):
+        yield from seq_scans(child)
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadtest import Collection, LoadRunner, ServerError, start_server
+
+COLLECTION = (settings.BASE_DIR.parent.parent / 'postman-collection'
+              / 'diploma.postman_collection.json')
+
+# Доли сценариев (папок коллекции) в смеси по умолчанию: чтение
+# преобладает, удаление рецептов выполняется реже остального.
+WEIGHTS = {
+    'users': 2,
+    'tags': 3,
+    'ingredients': 3,
+    'recipes': 4,
+    'subscriptions': 1,
+    'shopping_cart': 2,
+    'favorite': 2,
+    'recipe_filters_for_favorite_and_shopping_cart': 3,
+    'delete_requests': 1,
+}
+SETUP = ['register_and_get_tokens // No Auth']
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер сценариями из Postman-коллекции: '
+            'каждый виртуальный пользователь регистрирует свой набор '
+            'аккаунтов и выполняет папки коллекции в случайном порядке '
+            'с заданными весами. Печатает пропускную способность, '
+            'перцентили задержки и долю ошибок по каждому запросу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--collection', default=str(COLLECTION))
+        parser.add_argument(
+            '--base-url',
+            help='адрес сервера; по умолчанию baseUrl из коллекции')
+        parser.add_argument('--users', type=int, default=10,
+                            help='число одновременных пользователей')
+        parser.add_argument('--ramp-up', type=float, default=10,
+                            help='секунды на запуск всех пользователей')
+        parser.add_argument('--duration', type=float, default=60,
+                            help='секунды нагрузки после разгона')
+        parser.add_argument('--iterations', type=int, default=0,
+                            help='предел сценариев на пользователя')
+        parser.add_argument(
+            '--weight', action='append', default=[], metavar='ПАПКА=ВЕС',
+            help='вес сценария; 0 исключает папку из смеси')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=int(time.time()))
+        parser.add_argument(
+            '--server',
+            help='команда запуска сервера на время теста, например '
+                 '"gunicorn foodgram.wsgi:application -w 4 -b 127.0.0.1:8000"')
+        parser.add_argument('--max-error-rate', type=float,
+                            help='завершиться ошибкой при большей доле 5xx')
+        parser.add_argument('--output', help='файл для отчёта в JSON')
+
+    def handle(self, *args, **options):
+        try:
+            collection = Collection.load(options['collection'])
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать коллекцию: {error}')
+        weights = dict(WEIGHTS)
+        for value in options['weight']:
+            name, _, weight = value.rpartition('=')
+            if name not in collection.scenarios or not weight.isdigit():
+                raise CommandError(
+                    f'Неверный вес "{value}"; папки коллекции: '
+                    f'{", ".join(collection.scenarios)}.')
+            weights[name] = int(weight)
+        base_url = options['base_url'] or collection.variables.get(
+            'baseUrl', 'http://127.0.0.1:8000')
+        runner = LoadRunner(
+            collection, base_url, options['users'], options['ramp_up'],
+            options['duration'], options['iterations'], weights, SETUP,
+            options['timeout'], options['seed'],
+        )
+        if not runner.names:
+            raise CommandError('Все сценарии исключены весами.')
+
+        server = self.start_server(options['server'], base_url)
+        try:
+            failures = asyncio.run(runner.run())
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        for failure in failures[:5]:
+            self.stderr.write(f'{type(failure).__name__}: {failure}')
+
+        report = runner.report()
+        report['seed'] = options['seed']
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        limit = options['max_error_rate']
+        if limit is not None and report['total']['error_rate'] > limit:
+            raise CommandError(
+                f'Доля ошибок {report["total"]["error_rate"]} '
+                f'больше {limit}.')
+
+    def start_server(self, command, base_url):
+        if not command:
+            return None
+        try:
+            return start_server(command, base_url, settings.BASE_DIR)
+        except ServerError as error:
+            raise CommandError(str(error))
+
+    def print_report(self, report):
+        total = report['total']
+        self.stdout.write(
+            f'{report["users"]} пользователей, {report["duration"]} с, '
+            f'{total["requests"]} запросов, {total["rps"]} запр./с, '
+            f'ошибок {total["error_rate"]:.2%}, '
+            f'неожиданных статусов {total["unexpected_rate"]:.2%}'
+        )
+        self.stdout.write(
+            f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"app ms":>7} '
+            f'{"rps":>7} {"err":>6} {"unexp":>6}  запрос')
+        for name, result in sorted(report['requests'].items(),
+                                   key=lambda item: -item[1]['p95_ms']):
+            line = (
+                f'{result["p50_ms"]:>8} {result["p95_ms"]:>8} '
+                f'{result["p99_ms"]:>8} {str(result["server_p50_ms"]):>7} '
+                f'{result["rps"]:>7} {result["error_rate"]:>6.1%} '
+                f'{result["unexpected_rate"]:>6.1%}  {name}'
+            )
+            self.stdout.write(self.style.ERROR(line) if result['error_rate']
+                              else line)
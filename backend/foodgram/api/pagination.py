@@ -1,6 +1,121 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    page_size = 6
+    ordering = ('-pub_date', '-id')
+    # Параметры, задающие свой порядок выдачи: курсор по фиксированному
+    # порядку его бы молча подменил.
+    ordering_params = ('ordering', 'search')
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def check_ordering(self, request):
+        errors = {}
+        for param in self.ordering_params:
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            fields = tuple(field.strip() for field in value.split(','))
+            if param == 'ordering' and (
+                    fields == self.ordering[:len(fields)]):
+                continue
+            errors[param] = ['Не поддерживается курсорной пагинацией, '
+                             'используйте постраничную.']
+        if errors:
+            raise ValidationError(errors)
+
+
+class SubscriptionCursorPagination(RecipeCursorPagination):
+    ordering = ('-id',)
+    ordering_params = ()
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+    cursor_pagination_class = None
+
+    def use_cursor(self, request):
+        return self.cursor_pagination_class is not None and (
+            self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+            or request.query_params.get('pagination') == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            self.cursor_paginator.check_ordering(request)
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(CustomPagination):
+    cursor_pagination_class = RecipeCursorPagination
+
+
+class SubscriptionPagination(CustomPagination):
+    cursor_pagination_class = SubscriptionCursorPagination
+
+
+class AsyncPageMixin:
+    """Постраничный вывод для асинхронных представлений.
+
+    Повторяет ответ PageNumberPagination, но считает и выбирает страницу
+    через асинхронный ORM. Курсорный режим остаётся за DRF.
+    """
+
+    async def apaginate_queryset(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.count = await queryset.acount()
+        self.num_pages = max(1, -(-self.count // page_size))
+        page = request.query_params.get(self.page_query_param, 1)
+        if page in self.last_page_strings:
+            page = self.num_pages
+        try:
+            self.number = int(page)
+        except (TypeError, ValueError):
+            self.number = 0
+        if not 1 <= self.number <= self.num_pages:
+            raise NotFound(self.invalid_page_message)
+        start = (self.number - 1) * page_size
+        return [obj async for obj in queryset[start:start + page_size]]
+
+    def get_paginated_data(self, data):
+        url = self.request.build_absolute_uri()
+        next_link = previous_link = None
+        if self.number < self.num_pages:
+            next_link = replace_query_param(
+                url, self.page_query_param, self.number + 1)
+        if self.number == 2:
+            previous_link = remove_query_param(url, self.page_query_param)
+        elif self.number > 2:
+            previous_link = replace_query_param(
+                url, self.page_query_param, self.number - 1)
+        return {
+            'count': self.count,
+            'next': next_link,
+            'previous': previous_link,
+            'results': data,
+        }
+
+
+class AsyncRecipePagination(AsyncPageMixin, RecipePagination):
+    pass
+
+
+class AsyncSubscriptionPagination(AsyncPageMixin, SubscriptionPagination):
+    pass
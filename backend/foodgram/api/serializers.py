@@ -1,19 +1,22 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
+from recipes.membership import CART, FAVORITES, get_membership
 from recipes.models import (
-    Favorite,
     Ingredient,
     Recipe,
     RecipeIngredients,
     RecipeTag,
-    ShoppingCart,
     Tag,
-    IngredientAmount
 )
-from users.models import Subscription, User
+from recipes.shopping_list import change_recipe
+from recipes.signals import recipe_changed
+from recipes.tag_masks import mask_of
+from users.models import User
 from api.utils import check_subscription
 
 
@@ -49,6 +52,33 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         ]
 
 
+class ImageVariantsField(serializers.ReadOnlyField):
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'image_variants'
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        variants = {}
+        for name, variant in value.get('variants', {}).items():
+            urls = {
+                image_format: settings.MEDIA_URL + path
+                for image_format, path in variant['files'].items()
+            }
+            if request is not None:
+                urls = {
+                    image_format: request.build_absolute_uri(url)
+                    for image_format, url in urls.items()
+                }
+            variants[name] = {
+                'width': variant['width'],
+                'height': variant['height'],
+                **urls,
+            }
+        return variants
+
+
 class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -79,6 +109,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         method_name='get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
         method_name='get_is_in_shopping_cart')
+    images = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -92,29 +123,17 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time'
         ]
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-
-        return Favorite.objects.filter(
-            user=request.user,
-            recipe_id=obj
-        ).exists()
+        return obj.pk in get_membership(self.context.get('request'),
+                                        FAVORITES)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-
-        return ShoppingCart.objects.filter(
-            user=request.user,
-            recipe_id=obj
-        ).exists()
+        return obj.pk in get_membership(self.context.get('request'), CART)
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -124,24 +143,8 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit']
 
 
-class IngredientsInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.ReadOnlyField(
-        source='ingredient.id',
-    )
-    name = serializers.ReadOnlyField(
-        source='ingredient.name',
-    )
-    measurement_unit = serializers.ReadOnlyField(
-        source='ingredient.measurement_unit',
-    )
-
-    class Meta:
-        model = IngredientAmount
-        fields = ('id', 'name', 'measurement_unit', 'amount')
-
-
 class AddIngredientRecipeSerilizer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
 
     class Meta:
         model = RecipeIngredients
@@ -154,9 +157,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     ingredients = AddIngredientRecipeSerilizer(
         many=True
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField()
 
     class Meta:
@@ -172,21 +173,29 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             'cooking_time'
         ]
 
-    def validate(self, data):
-        ingredients = data['ingredients']
-        ingredient_list = []
-        for ingredient in ingredients:
-            amount = ingredient['amount']
-            if int(amount) < 1 or int(amount) < 0:
-                raise serializers.ValidationError({
-                    'Минимальное количество ингредиента - 1.'
-                })
-            if ingredient['id'] in ingredient_list:
-                raise serializers.ValidationError({
-                    'Ингредиенты в рецепте должны быть уникальны.'
-                })
-            ingredient_list.append(ingredient['id'])
-        return data
+    @staticmethod
+    def resolve(model, ids, name):
+        """Загружает объекты одним запросом, сохраняя порядок ids."""
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                f'{name} в рецепте должны быть уникальны.')
+        objects = model.objects.in_bulk(ids)
+        missing = [str(pk) for pk in ids if pk not in objects]
+        if missing:
+            raise serializers.ValidationError(
+                f'{name} не найдены: {", ".join(missing)}.')
+        return [objects[pk] for pk in ids]
+
+    def validate_ingredients(self, ingredients):
+        objects = self.resolve(
+            Ingredient, [ingredient['id'] for ingredient in ingredients],
+            'Ингредиенты')
+        for ingredient, obj in zip(ingredients, objects):
+            ingredient['id'] = obj
+        return ingredients
+
+    def validate_tags(self, tags):
+        return self.resolve(Tag, tags, 'Тэги')
 
     def create_ingredient(self, ingredients, recipe):
         RecipeIngredients.objects.bulk_create([
@@ -203,82 +212,111 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             [RecipeTag(recipe=recipe, tag=tag) for tag in tags]
         )
 
+    def update_ingredient(self, ingredients, recipe):
+        """Применяет к ингредиентам рецепта только разницу.
+
+        Возвращает количества ингредиентов до и после изменения.
+        """
+        current = {
+            ingredient_id: (pk, amount) for pk, ingredient_id, amount in
+            RecipeIngredients.objects.filter(recipe=recipe).values_list(
+                'pk', 'ingredient_id', 'amount')
+        }
+        old_amounts = {
+            ingredient_id: amount
+            for ingredient_id, (_, amount) in current.items()
+        }
+        new_amounts = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients
+        }
+        RecipeIngredients.objects.bulk_create([
+            RecipeIngredients(recipe=recipe, ingredient_id=ingredient_id,
+                              amount=amount)
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in current
+        ])
+        RecipeIngredients.objects.bulk_update([
+            RecipeIngredients(pk=current[ingredient_id][0], amount=amount)
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id in current
+            and current[ingredient_id][1] != amount
+        ], ['amount'])
+        removed = old_amounts.keys() - new_amounts.keys()
+        if removed:
+            RecipeIngredients.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        return old_amounts, new_amounts
+
+    def update_tag(self, tags, recipe):
+        current = set(RecipeTag.objects.filter(recipe=recipe).values_list(
+            'tag_id', flat=True))
+        new = {tag.pk for tag in tags}
+        RecipeTag.objects.bulk_create([
+            RecipeTag(recipe=recipe, tag_id=tag_id)
+            for tag_id in new - current
+        ])
+        if current - new:
+            RecipeTag.objects.filter(
+                recipe=recipe, tag_id__in=current - new).delete()
+
+    @transaction.atomic
     def create(self, validated_data):
 
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         author = self.context.get('request').user
-        recipe = Recipe.objects.create(author=author, **validated_data)
+        recipe = Recipe.objects.create(author=author, tag_mask=mask_of(tags),
+                                       **validated_data)
         self.create_ingredient(ingredients, recipe)
         self.create_tag(tags, recipe)
+        recipe_changed.send(sender=Recipe, recipe=recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
 
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        RecipeTag.objects.filter(recipe=instance).delete()
-        RecipeIngredients.objects.filter(recipe=instance).delete()
-        self.create_ingredient(ingredients, instance)
-        self.create_tag(tags, instance)
-        return super().update(instance, validated_data)
-
-    def representation(self, instance):
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        ingredients_changed = False
+        if ingredients is not None:
+            old_amounts, new_amounts = self.update_ingredient(
+                ingredients, instance)
+            ingredients_changed = old_amounts != new_amounts
+            if ingredients_changed:
+                change_recipe(instance.pk, old_amounts, new_amounts)
+        if tags is not None:
+            self.update_tag(tags, instance)
+            validated_data['tag_mask'] = mask_of(tags)
+        recipe = super().update(instance, validated_data)
+        recipe_changed.send(sender=Recipe, recipe=recipe,
+                            ingredients_changed=ingredients_changed)
+        return recipe
 
+    def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'tags',
+            Prefetch('ingredient_recipe',
+                     queryset=RecipeIngredients.objects.select_related(
+                         'ingredient'))
+        )
         return RecipeSerializer(instance, context={
             'request': self.context.get('request')}).data
 
 
 class ShowFavoriteSerializer(serializers.ModelSerializer):
+    images = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
-
-
-class FavoriteSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = Favorite
-        fields = ['user', 'recipe']
-
-    def validate(self, data):
-        if Favorite.objects.filter(user=data['user'],
-                                   recipe=data['recipe']).exists():
-            raise serializers.ValidationError(
-                'Вы уже добавили рецепт в избранное'
-            )
-        return data
-
-    def representation(self, instance):
-        return ShowFavoriteSerializer(instance.recipe, context={
-            'request': self.context.get('request')}).data
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = ShoppingCart
-        fields = ['user', 'recipe']
-
-    def validate(self, data):
-        if ShoppingCart.objects.filter(user=data['user'],
-                                       recipe=data['recipe']).exists():
-            raise serializers.ValidationError(
-                'Вы уже добавили этот рецепт в корзину'
-            )
-        return data
-
-    def representation(self, instance):
-        return ShowFavoriteSerializer(instance.recipe, context={
-            'request': self.context.get('request')}).data
+        fields = ['id', 'name', 'image', 'images', 'cooking_time']
 
 
 class ShowSubscriptionsSerializer(serializers.ModelSerializer):
 
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -295,31 +333,20 @@ class ShowSubscriptionsSerializer(serializers.ModelSerializer):
         if not request or request.user.is_anonymous:
             return False
 
-        recipes = Recipe.objects.filter(author=obj)
-        limit = request.query_params.get('recipes_limit')
-
-        if limit:
-            recipes = recipes[:int(limit)]
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = Recipe.objects.filter(author=obj)
+            limit = request.query_params.get('recipes_limit')
+            if limit:
+                recipes = recipes[:int(limit)]
 
         return ShowFavoriteSerializer(
             recipes, many=True, context={'request': request}).data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
 
-class SubscriptionSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = Subscription
-        fields = ['user', 'author']
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Subscription.objects.all(),
-                fields=['user', 'author'],
-            )
-        ]
-
-    def representation(self, instance):
-        return ShowSubscriptionsSerializer(instance.author, context={
-            'request': self.context.get('request')}).data
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=100
+    )
@@ -0,0 +1,340 @@
+import io
+import os
+import shutil
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from rest_framework.test import (
+    APIClient,
+    APIRequestFactory,
+    force_authenticate,
+)
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredients,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+from recipes.shopping_list import add_recipe
+from recipes.signals import recipe_changed
+from recipes.tag_masks import filter_by_tags, masks_by_slug
+from recipes.versions import (
+    INGREDIENTS_VERSION,
+    RECIPES_VERSION,
+    TAGS_VERSION,
+    cart_version_key,
+    get_version,
+)
+from users.models import Subscription, User
+from . import async_views
+from .exports import PdfExporter
+from .views import CartViewSet, FavoriteView, SubscribeView, TagViewSet
+
+
+class RecipeQueryCountTests(TestCase):
+    """Число SQL-запросов ленты и рецепта не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(30)
+        ])
+        call_command('generate_data', users=20, recipes=120, favorites=300,
+                     carts=60, subscriptions=60, seed=1, stdout=io.StringIO())
+        cls.user = User.objects.order_by('-recipes_count').first()
+        cls.recipe = Recipe.objects.order_by('pk').first()
+
+    def setUp(self):
+        # Версии и множества избранного хранятся в кэше: каждый тест
+        # начинает с холодного кэша.
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_queries(self, client, path, number):
+        with self.assertNumQueries(number):
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        for limit in (2, 10, 50):
+            for name, client, number in (('anonymous', self.anonymous, 5),
+                                         ('authenticated', self.client, 8)):
+                with self.subTest(limit=limit, client=name):
+                    cache.clear()
+                    response = self.assert_queries(
+                        client, f'/api/recipes/?limit={limit}', number)
+                    self.assertEqual(len(response.data['results']), limit)
+
+    def test_detail(self):
+        path = f'/api/recipes/{self.recipe.pk}/'
+        self.assert_queries(self.anonymous, path, 4)
+        self.assert_queries(self.client, path, 7)
+
+
+class VersionOnCommitTests(TestCase):
+    """Версии кэша меняются только после фиксации транзакции."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reader',
+                                       email='reader@example.com')
+        image = 'recipes/images/test.png'
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Текст', cooking_time=5,
+            image=image, image_variants={'source': image})
+        cls.ingredient = Ingredient.objects.create(name='Соль',
+                                                   measurement_unit='г')
+        RecipeIngredients.objects.create(recipe=cls.recipe,
+                                         ingredient=cls.ingredient,
+                                         amount=5)
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipe)
+        add_recipe(cls.user.pk, cls.recipe.pk)
+
+    def assert_bumped_on_commit(self, change, key=None):
+        key = key or cart_version_key(self.user.pk)
+        version = get_version(key)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            change()
+            self.assertEqual(get_version(key), version)
+        self.assertTrue(callbacks)
+        self.assertNotEqual(get_version(key), version)
+
+    def test_recipe_changed(self):
+        self.assert_bumped_on_commit(lambda: recipe_changed.send(
+            sender=Recipe, recipe=self.recipe))
+
+    def test_ingredient_renamed(self):
+        self.ingredient.name = 'Морская соль'
+        self.assert_bumped_on_commit(self.ingredient.save)
+
+    def test_ingredient_created(self):
+        self.assert_bumped_on_commit(
+            lambda: Ingredient.objects.create(name='Перец',
+                                              measurement_unit='г'),
+            INGREDIENTS_VERSION)
+
+    def test_tag_created(self):
+        masks_by_slug()
+        self.assert_bumped_on_commit(
+            lambda: Tag.objects.create(name='Обед', color='#49B64E',
+                                       slug='lunch'),
+            TAGS_VERSION)
+        self.assertTrue(masks_by_slug()['lunch'])
+
+    def test_recipe_deleted(self):
+        self.assert_bumped_on_commit(self.recipe.delete, RECIPES_VERSION)
+
+
+class ShoppingListPdfTests(TestCase):
+    """Ошибка шрифта видна до начала потоковой передачи."""
+
+    path = '/api/recipes/download_shopping_cart/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(
+            username='reader', email='reader@example.com'))
+
+    @override_settings(SHOPPING_LIST_FONT='/nonexistent/font.ttf')
+    @mock.patch.object(PdfExporter, 'font', 'MissingShoppingListFont')
+    def test_missing_font(self):
+        response = self.client.get(self.path)
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.streaming)
+        self.assertIn('type=csv', response.data['detail'])
+
+    def test_pdf(self):
+        response = self.client.get(self.path)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            b''.join(response.streaming_content).startswith(b'%PDF'))
+
+
+class TagFilterTests(TestCase):
+    """Неизвестный тэг или тэг без бита не расширяет выборку."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username='author',
+                                     email='author@example.com')
+        cls.breakfast, cls.lunch = (
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (('Завтрак', '#E26C2D', 'breakfast'),
+                                      ('Обед', '#49B64E', 'lunch'))
+        )
+        # bulk_create не выдаёт бит маски.
+        Tag.objects.bulk_create([Tag(name='Ужин', color='#8775D2',
+                                     slug='dinner')])
+        image = 'recipes/images/test.png'
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=tag.name, text='Текст', cooking_time=5,
+                image=image, image_variants={'source': image},
+                tag_mask=tag.mask)
+            for tag in (cls.breakfast, cls.lunch)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def names(self, slugs, match_all):
+        recipes = filter_by_tags(Recipe.objects.all(), slugs, match_all)
+        return sorted(recipes.values_list('name', flat=True))
+
+    def test_all_of(self):
+        for missing in ('unknown', 'dinner'):
+            with self.subTest(missing=missing):
+                self.assertEqual(self.names([missing], True), [])
+                self.assertEqual(self.names(['breakfast', missing], True),
+                                 [])
+        self.assertEqual(self.names(['breakfast'], True), ['Завтрак'])
+
+    def test_any_of(self):
+        for missing in ('unknown', 'dinner'):
+            with self.subTest(missing=missing):
+                self.assertEqual(self.names([missing], False), [])
+                self.assertEqual(self.names(['breakfast', missing], False),
+                                 ['Завтрак'])
+        self.assertEqual(self.names(['breakfast', 'lunch'], False),
+                         ['Завтрак', 'Обед'])
+
+
+class AsyncVaryTests(TestCase):
+    """Асинхронные ответы варьируются по тем же заголовкам, что и DRF."""
+
+    def vary(self, response):
+        return {header.strip() for header in response['Vary'].split(',')}
+
+    def test_same_vary_as_drf(self):
+        factory = RequestFactory()
+        drf = TagViewSet.as_view({'get': 'list'})(factory.get('/'))
+        response = async_to_sync(async_views.tags_view)(factory.get('/'))
+        self.assertEqual(self.vary(response), self.vary(drf))
+        not_modified = async_to_sync(async_views.tags_view)(
+            factory.get('/', HTTP_IF_NONE_MATCH=response['ETag']))
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(self.vary(not_modified), self.vary(drf))
+        missing = async_to_sync(async_views.tag_view)(factory.get('/'),
+                                                      pk=0)
+        self.assertEqual(missing.status_code, 404)
+        self.assertIn('Accept', self.vary(missing))
+
+
+class EndpointBudgetTests(TestCase):
+    """Бюджеты запросов bench_endpoints на маленьком наборе данных."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.media_root = media_root
+
+    def test_budgets(self):
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(30)
+        ])
+        output = io.StringIO()
+        try:
+            call_command('bench_endpoints', iterations=1, warmup=1,
+                         users=20, recipes=100, stdout=output)
+        except CommandError as error:
+            self.fail(f'{error}\n{output.getvalue()}')
+        # Картинки созданных рецептов не остаются в MEDIA_ROOT.
+        self.assertEqual(os.listdir(self.media_root), [])
+
+
+class ToggleConcurrencyTests(TransactionTestCase):
+    """Одновременные нажатия избранного, корзины и подписки."""
+
+    threads = 8
+    rounds = 5
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('SQLite в памяти не пускает параллельную запись.')
+        self.author, self.user = (
+            User.objects.create(username=name, email=f'{name}@example.com',
+                                first_name=name, last_name=name)
+            for name in ('author', 'reader')
+        )
+        image = 'recipes/images/test.png'
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Текст', cooking_time=5,
+            image=image, image_variants={'source': image})
+        self.ingredient = Ingredient.objects.create(name='Соль',
+                                                    measurement_unit='г')
+        RecipeIngredients.objects.create(recipe=self.recipe,
+                                         ingredient=self.ingredient,
+                                         amount=5)
+        self.factory = APIRequestFactory()
+
+    def click(self, barrier, view, method, pk):
+        request = getattr(self.factory, method)('/')
+        force_authenticate(request, self.user)
+        barrier.wait()
+        try:
+            return view.as_view()(request, id=pk).status_code
+        except Exception:
+            return 500
+        finally:
+            connection.close()
+
+    def burst(self, view, method, pk):
+        barrier = Barrier(self.threads)
+        with ThreadPoolExecutor(self.threads) as pool:
+            return Counter(pool.map(
+                lambda _: self.click(barrier, view, method, pk),
+                range(self.threads)))
+
+    def test_no_errors_and_consistent_counts(self):
+        targets = [
+            ('favorite', FavoriteView, self.recipe.pk),
+            ('cart', CartViewSet, self.recipe.pk),
+            ('subscribe', SubscribeView, self.author.pk),
+        ]
+        for name, view, pk in targets:
+            bursts = [('post', 201), ('delete', 204)] * self.rounds
+            for method, success in bursts + [('post', 201)]:
+                with self.subTest(target=name, method=method):
+                    statuses = self.burst(view, method, pk)
+                    self.assertFalse(
+                        [status for status in statuses if status >= 500])
+                    self.assertEqual(statuses[success], 1)
+                    self.assertEqual(statuses[400], self.threads - 1)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.recipe.in_carts_count, 1)
+        self.assertEqual(Favorite.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(
+            ShoppingCart.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(
+            Subscription.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(
+            list(ShoppingListItem.objects.filter(user=self.user).values_list(
+                'ingredient', 'total_amount')),
+            [(self.ingredient.pk, 5)])
@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (
+    BulkCartView,
+    BulkFavoriteView,
+    BulkSubscribeView,
     CartViewSet,
     FavoriteView,
     IngredientViewSet,
@@ -26,6 +30,21 @@ urlpatterns = [
         download_cart,
         name='download_shopping_cart'
     ),
+    path(
+        'recipes/favorite/',
+        BulkFavoriteView.as_view(),
+        name='favorite_bulk'
+    ),
+    path(
+        'recipes/shopping_cart/',
+        BulkCartView.as_view(),
+        name='shopping_cart_bulk'
+    ),
+    path(
+        'users/subscribe/',
+        BulkSubscribeView.as_view(),
+        name='subscribe_bulk'
+    ),
     path(
         'recipes/<int:id>/favorite/',
         FavoriteView.as_view(),
@@ -51,3 +70,20 @@ urlpatterns = [
     path('', include('djoser.urls')),
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views
+
+    urlpatterns = [
+        path('tags/', async_views.tags_view, name='tags-list'),
+        path('tags/<int:pk>/', async_views.tag_view, name='tags-detail'),
+        path('ingredients/', async_views.ingredients_view,
+             name='ingredients-list'),
+        path('ingredients/<int:pk>/', async_views.ingredient_view,
+             name='ingredients-detail'),
+        path('recipes/', async_views.recipes_view, name='recipes-list'),
+        path('recipes/<int:pk>/', async_views.recipe_view,
+             name='recipes-detail'),
+        path('users/subscriptions/', async_views.subscriptions_view,
+             name='subscriptions'),
+    ] + urlpatterns
@@ -1,35 +1,105 @@
+from django.db import connection, transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
 
-from recipes.models import Recipe
+from recipes.counters import counters_changed
+from recipes.membership import SUBSCRIPTIONS, get_membership
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.versions import (
+    bump_version,
+    cart_version_key,
+    favorites_version_key,
+    subscriptions_version_key,
+)
 from users.models import Subscription
 
+VERSION_KEYS = {
+    Favorite: favorites_version_key,
+    ShoppingCart: cart_version_key,
+    Subscription: subscriptions_version_key,
+}
+
 
 def check_subscription(self, obj):
-    request = self.context.get('request')
-    if request is None or request.user.is_anonymous:
-        return False
-    return Subscription.objects.filter(user=request.user, author=obj).exists()
-
-
-def post_shortcut(self, request, id, serializer_obj):
-    data = {
-        'user': request.user.id,
-        'recipe': id
-    }
-    serializer = serializer_obj(
-        data=data, context={'request': request}
+    return obj.pk in get_membership(self.context.get('request'),
+                                    SUBSCRIPTIONS)
+
+
+def insert_links(model, user_id, field, target_ids):
+    """Создаёт связи одним INSERT ... ON CONFLICT DO NOTHING.
+
+    Возвращает множество целей, для которых связь действительно
+    создана: уже существующие связи и несуществующие цели пропускаются.
+    """
+    quote = connection.ops.quote_name
+    target = model._meta.get_field(field)
+    related = target.related_model._meta
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} '
+        f'({quote(model._meta.get_field("user").column)}, '
+        f'{quote(target.column)}) '
+        f'SELECT %s, {quote(related.pk.column)} '
+        f'FROM {quote(related.db_table)} '
+        f'WHERE {quote(related.pk.column)} IN ({placeholders}) '
+        f'ON CONFLICT DO NOTHING RETURNING {quote(target.column)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, *target_ids])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_links(model, user_id, field, target_ids):
+    """Удаляет связи одним DELETE, возвращает множество удалённых целей."""
+    quote = connection.ops.quote_name
+    target = model._meta.get_field(field)
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    sql = (
+        f'DELETE FROM {quote(model._meta.db_table)} '
+        f'WHERE {quote(model._meta.get_field("user").column)} = %s '
+        f'AND {quote(target.column)} IN ({placeholders}) '
+        f'RETURNING {quote(target.column)}'
     )
-    serializer.is_valid(raise_exception=True)
-    serializer.save()
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, *target_ids])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def link_changed(model, user_id):
+    key = VERSION_KEYS[model](user_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def link_error(model, field, id, message):
+    if not model.objects.filter(pk=id).exists():
+        return Response(
+            {field: [f'Недопустимый первичный ключ "{id}" - '
+                     f'объект не существует.']},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response({'non_field_errors': [message]},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+
+@transaction.atomic
+def post_shortcut(self, request, id, model_obj, counter, message):
+    if not insert_links(model_obj, request.user.id, 'recipe', [id]):
+        return link_error(Recipe, 'recipe', id, message)
+    Recipe.objects.filter(id=id).update(**{counter: F(counter) + 1})
+    counters_changed()
+    link_changed(model_obj, request.user.id)
+    return Response({'user': request.user.id, 'recipe': id},
+                    status=status.HTTP_201_CREATED)
 
 
-def delete_shortcut(self, request, id, model_obj):
-    recipe = get_object_or_404(Recipe, id=id)
-    if model_obj.objects.filter(
-       user=request.user, recipe=recipe).exists():
-        model_obj.objects.filter(user=request.user, recipe=recipe).delete()
+@transaction.atomic
+def delete_shortcut(self, request, id, model_obj, counter):
+    if delete_links(model_obj, request.user.id, 'recipe', [id]):
+        Recipe.objects.filter(id=id).update(**{counter: F(counter) - 1})
+        counters_changed()
+        link_changed(model_obj, request.user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
+    get_object_or_404(Recipe, id=id)
     return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -1,14 +1,28 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import (
+    Count,
+    F,
+    Max,
+    Prefetch,
+    Window,
+)
+from django.db.models.functions import RowNumber
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.filters import OrderingFilter
 from rest_framework.generics import ListAPIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import (
+    SAFE_METHODS,
+    AllowAny,
+    IsAuthenticated,
+)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from recipes.counters import COUNTER_FIELDS, counters_changed
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -17,51 +31,177 @@ from recipes.models import (
     ShoppingCart,
     Tag,
 )
+from recipes.shopping_list import (
+    add_recipe,
+    add_recipes,
+    remove_recipe,
+    remove_recipes,
+)
+from recipes.versions import (
+    COUNTERS_VERSION,
+    INGREDIENTS_VERSION,
+    RECIPES_VERSION,
+    TAGS_VERSION,
+    get_version,
+    get_versions,
+    user_version_keys,
+)
+from mixins import ConditionalGetMixin
 from users.models import Subscription, User
-from .filters import IngredientsFilter, RecipeFilter
-from .pagination import CustomPagination
+from .autocomplete import ingredient_index
+from .exports import EXPORTERS, export_shopping_list
+from .filters import IngredientsFilter, RecipeFilter, filter_by_name_prefix
+from .pagination import (
+    CustomPagination,
+    RecipePagination,
+    SubscriptionPagination,
+)
 from .permissions import IsAdminOrReadOnly
 from .serializers import (
+    BulkIdsSerializer,
     CreateRecipeSerializer,
-    FavoriteSerializer,
     IngredientSerializer,
     RecipeSerializer,
-    ShoppingCartSerializer,
     ShowSubscriptionsSerializer,
-    SubscriptionSerializer,
     TagSerializer,
 )
-from .utils import post_shortcut, delete_shortcut
+from .utils import (
+    delete_links,
+    delete_shortcut,
+    insert_links,
+    link_changed,
+    link_error,
+    post_shortcut,
+)
+
+
+def collection_validators(key, version=None):
+    if version is None:
+        version = get_version(key)
+    return f'{key}:{version}', version / 10 ** 9
+
+
+def recipe_ordering(request):
+    return request.query_params.get('ordering', '')
+
+
+def recipe_version_keys(request):
+    keys = [TAGS_VERSION, RECIPES_VERSION]
+    # Порядок по счётчикам меняется без изменения самих рецептов.
+    if COUNTER_FIELDS & {field.strip().lstrip('-')
+                         for field in recipe_ordering(request).split(',')}:
+        keys.append(COUNTERS_VERSION)
+    if request.user.is_authenticated:
+        keys += user_version_keys(request.user.id)
+    return keys
+
+
+def recipe_validators(state, versions, ordering=''):
+    """ETag и Last-Modified по числу рецептов, их изменению и версиям."""
+    updated = state['updated'].timestamp()
+    key = ':'.join(map(str, [state['count'], updated, ordering, *versions]))
+    return key, max(updated, *(version / 10 ** 9 for version in versions))
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+def recipes_for_reading():
+    return Recipe.objects.defer('search_vector').select_related(
+        'author'
+    ).prefetch_related(
+        'tags',
+        Prefetch(
+            'ingredient_recipe',
+            queryset=RecipeIngredients.objects.select_related('ingredient')
+        ),
+    )
+
+
+def subscriptions_for(user, limit):
+    """Авторы, на которых подписан user, с последними limit рецептами."""
+    recipes = Recipe.objects.all()
+    if limit and limit.isdigit():
+        recipes = recipes.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=F('pub_date').desc(),
+            )
+        ).filter(row_number__lte=int(limit))
+    return User.objects.filter(author__user=user).order_by(
+        '-id'
+    ).prefetch_related(
+        Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+    )
+
+
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     permission_classes = [AllowAny, ]
     pagination_class = None
     serializer_class = TagSerializer
 
+    def get_validators(self, request):
+        return collection_validators(TAGS_VERSION)
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     permission_classes = [AllowAny, ]
     filter_backends = [IngredientsFilter, ]
     serializer_class = IngredientSerializer
     pagination_class = None
 
+    def get_validators(self, request):
+        return collection_validators(INGREDIENTS_VERSION)
+
     def get_queryset(self):
         queryset = Ingredient.objects.all()
         ingredients_name = self.request.query_params.get('name')
         if ingredients_name is not None:
-            queryset = queryset.filter(name__istartswith=ingredients_name)
+            queryset = filter_by_name_prefix(queryset, ingredients_name)
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.search, request)
+
+    def search(self, request):
+        ingredients_name = request.query_params.get('name')
+        if ingredients_name is None:
+            return Response(ingredient_index.all())
+        return Response(ingredient_index.search(ingredients_name))
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsAdminOrReadOnly, ]
-    filter_backends = [DjangoFilterBackend, ]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = RecipeFilter
-    pagination_class = CustomPagination
+    ordering_fields = ['pub_date', 'favorites_count', 'in_carts_count']
+    pagination_class = RecipePagination
+
+    def get_queryset(self):
+        if self.request.method not in SAFE_METHODS:
+            return Recipe.objects.select_related('author')
+
+        return recipes_for_reading()
+
+    def get_validators(self, request):
+        if self.paginator.use_cursor(request):
+            return None
+        queryset = Recipe.objects.all()
+        try:
+            if self.action == 'retrieve':
+                queryset = queryset.filter(pk=self.kwargs['pk'])
+            else:
+                queryset = self.filter_queryset(queryset)
+            state = queryset.aggregate(count=Count('pk'),
+                                       updated=Max('updated_at'))
+        except (TypeError, ValueError):
+            return None
+        if not state['count']:
+            return None
+        keys = recipe_version_keys(request)
+        return recipe_validators(state, get_versions(keys),
+                                 recipe_ordering(request))
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -78,38 +218,32 @@ class SubscribeView(APIView):
     permission_classes = [IsAuthenticated, ]
 
     def post(self, request, id):
-        data = {
-            'user': request.user.id,
-            'author': id
-        }
-        serializer = SubscriptionSerializer(
-            data=data,
-            context={'request': request}
-        )
-
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if not insert_links(Subscription, request.user.id, 'author', [id]):
+            return link_error(User, 'author', id,
+                              'Вы уже подписаны на этого автора.')
+        link_changed(Subscription, request.user.id)
+        return Response({'user': request.user.id, 'author': id},
+                        status=status.HTTP_201_CREATED)
 
     def delete(self, request, id):
-        author = get_object_or_404(User, id=id)
-        if Subscription.objects.filter(
-           user=request.user, author=author).exists():
-            subscribed = get_object_or_404(
-                Subscription, user=request.user, author=author
-            )
-            subscribed.delete()
+        if delete_links(Subscription, request.user.id, 'author', [id]):
+            link_changed(Subscription, request.user.id)
             return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(User, id=id)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
 class ShowSubscriptionsViewSet(ListAPIView):
-    pagination_class = CustomPagination
+    pagination_class = SubscriptionPagination
     permission_classes = [IsAuthenticated, ]
 
+    def get_queryset(self):
+        return subscriptions_for(
+            self.request.user,
+            self.request.query_params.get('recipes_limit'))
+
     def get(self, request):
-        user = request.user
-        queryset = User.objects.filter(author__user=user)
+        queryset = self.get_queryset()
         page = self.paginate_queryset(queryset)
         serializer = ShowSubscriptionsSerializer(
             page, many=True, context={'request': request}
@@ -122,41 +256,131 @@ class FavoriteView(APIView):
     permission_classes = [IsAuthenticated, ]
 
     def post(self, request, id):
-        return post_shortcut(self, request, id,
-                             FavoriteSerializer)
+        return post_shortcut(self, request, id, Favorite, 'favorites_count',
+                             'Вы уже добавили рецепт в избранное')
 
     def delete(self, request, id):
-        return delete_shortcut(self, request, id, Favorite)
+        return delete_shortcut(self, request, id, Favorite,
+                               'favorites_count')
 
 
 class CartViewSet(APIView):
     permission_classes = [IsAuthenticated, ]
 
+    @transaction.atomic
     def post(self, request, id):
-        return post_shortcut(self, request, id,
-                             ShoppingCartSerializer)
+        response = post_shortcut(self, request, id, ShoppingCart,
+                                 'in_carts_count',
+                                 'Вы уже добавили этот рецепт в корзину')
+        if response.status_code == status.HTTP_201_CREATED:
+            add_recipe(request.user.id, id)
+        return response
 
+    @transaction.atomic
     def delete(self, request, id):
-        return delete_shortcut(self, request, id, ShoppingCart)
+        response = delete_shortcut(self, request, id, ShoppingCart,
+                                   'in_carts_count')
+        if response.status_code == status.HTTP_204_NO_CONTENT:
+            remove_recipe(request.user.id, id)
+        return response
+
+
+class BulkLinkView(APIView):
+    """Добавляет или удаляет связи пользователя с несколькими объектами."""
+    permission_classes = [IsAuthenticated, ]
+    model = None
+    field = 'recipe'
+    counter = None
+
+    def get_ids(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['ids']))
+
+    def existing(self, ids):
+        target = self.model._meta.get_field(self.field).related_model
+        return set(target.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True))
+
+    def on_change(self, user_id, ids, delta):
+        if self.counter:
+            Recipe.objects.filter(pk__in=ids).update(
+                **{self.counter: F(self.counter) + delta})
+            counters_changed()
+        link_changed(self.model, user_id)
+
+    def results(self, ids, found, changed, statuses):
+        done, skipped = statuses
+        return Response({'results': [
+            {'id': pk,
+             'status': (done if pk in changed
+                        else skipped if pk in found else 'not_found')}
+            for pk in ids
+        ]})
+
+    @transaction.atomic
+    def post(self, request):
+        ids = self.get_ids(request)
+        found = self.existing(ids)
+        created = set()
+        if found:
+            created = insert_links(self.model, request.user.id, self.field,
+                                   list(found))
+        if created:
+            self.on_change(request.user.id, created, 1)
+        return self.results(ids, found, created, ('created', 'exists'))
+
+    @transaction.atomic
+    def delete(self, request):
+        ids = self.get_ids(request)
+        found = self.existing(ids)
+        deleted = set()
+        if found:
+            deleted = delete_links(self.model, request.user.id, self.field,
+                                   list(found))
+        if deleted:
+            self.on_change(request.user.id, deleted, -1)
+        return self.results(ids, found, deleted, ('deleted', 'absent'))
+
+
+class BulkFavoriteView(BulkLinkView):
+    model = Favorite
+    counter = 'favorites_count'
+
+
+class BulkCartView(BulkLinkView):
+    model = ShoppingCart
+    counter = 'in_carts_count'
+
+    def on_change(self, user_id, ids, delta):
+        super().on_change(user_id, ids, delta)
+        if delta > 0:
+            add_recipes(user_id, ids)
+        else:
+            remove_recipes(user_id, ids)
+
+
+class BulkSubscribeView(BulkLinkView):
+    model = Subscription
+    field = 'author'
 
 
 @api_view(['GET'])
+@permission_classes([IsAuthenticated])
 def download_cart(request):
-    ingredients = RecipeIngredients.objects.filter(
-        recipe__shopping_cart__user=request.user).values(
-        'ingredient__name', 'ingredient__measurement_unit').annotate(
-        amount_in_cart=Sum('amount')
-    )
-    ingredient_list = "Ваш список покупок:"
-    for number, ingr in enumerate(ingredients):
-        ingredient_list += (
-            f"\n{ingr['ingredient__name']} - "
-            f"{ingr['amount_in_cart']} {ingr['ingredient__measurement_unit']}"
+    exporter = EXPORTERS.get(request.query_params.get('type', 'pdf'))
+    if exporter is None:
+        return Response(
+            {'type': f'Доступные форматы: {", ".join(EXPORTERS)}.'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        if number < ingredients.count() - 1:
-            ingredient_list += ', '
-    response = HttpResponse(ingredient_list,
-                            'Content-Type: application/pdf')
+    exporter = exporter()
+    exporter.prepare()
+    response = StreamingHttpResponse(
+        export_shopping_list(request.user, exporter),
+        content_type=exporter.content_type
+    )
     file = 'shopping_list'
-    response['Content-Disposition'] = f'attachment; filename="{file}.pdf"'
+    response['Content-Disposition'] = (
+        f'attachment; filename="{file}.{exporter.extension}"')
     return response
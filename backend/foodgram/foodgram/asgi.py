@@ -3,5 +3,18 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', 'True')
+# Постоянные соединения привязаны к потоку, а асинхронные запросы ходят
+# в базу из разных потоков: соединения переиспользует пул DB_POOL_SIZE.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+from django.db import connections  # noqa: E402
+
+from api.autocomplete import ingredient_index  # noqa: E402
+
+ingredient_index.warm()
+# Запросы обслуживаются в других потоках, соединение основного потока
+# само не закроется и держало бы место в пуле DB_POOL_SIZE.
+connections.close_all()
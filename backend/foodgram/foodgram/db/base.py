@@ -0,0 +1,36 @@
+from functools import partial
+
+from django.db.backends.postgresql import base
+
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с пулом соединений из OPTIONS['pool'].
+
+    Ключи пула: max_size, timeout, max_lifetime. При CONN_HEALTH_CHECKS
+    соединение из пула проверяется запросом перед выдачей.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict['OPTIONS']['pool'],
+                        self.settings_dict['CONN_HEALTH_CHECKS'])
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(
+            partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if self.in_atomic_block:
+            # Обёртка продолжит ссылаться на соединение до отката.
+            self.pool.discard(self.connection)
+        else:
+            self.pool.release(self.connection)
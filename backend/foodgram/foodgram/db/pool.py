@@ -0,0 +1,202 @@
+import time
+from collections import deque
+from threading import Condition, Lock
+
+from psycopg2 import OperationalError
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_INERROR,
+    TRANSACTION_STATUS_INTRANS,
+)
+
+from foodgram.metrics import WAIT_BUCKETS, Histogram, registry
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """Пул соединений psycopg2 внутри процесса-воркера.
+
+    Соединение выдаётся при открытии соединения Django и возвращается при
+    его закрытии, то есть обычно на время запроса. Открытых соединений не
+    больше max_size; потоку, которому не хватило соединения, приходится
+    ждать до timeout секунд.
+    """
+
+    def __init__(self, alias, max_size, timeout=30, max_lifetime=3600,
+                 check=False):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check = check
+        self.condition = Condition()
+        self.idle = deque()
+        self.created = {}
+        self.total = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.opened = 0
+        self.timeouts = 0
+        self.wait = Histogram(WAIT_BUCKETS)
+
+    def acquire(self, connect):
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            self.waiting += 1
+            try:
+                while not self.idle and self.total >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f'Все {self.max_size} соединений пула '
+                            f'{self.alias} заняты дольше {self.timeout} с.')
+                    self.condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.wait.observe(time.perf_counter() - started)
+            self.in_use += 1
+            connection = self.idle.pop() if self.idle else None
+            if connection is None:
+                self.total += 1
+
+        if connection is not None and not self.usable(connection):
+            # Место в пуле остаётся за потоком, соединение открывается
+            # заново.
+            with self.condition:
+                del self.created[connection]
+            connection.close()
+            connection = None
+        if connection is None:
+            try:
+                connection = connect()
+            except BaseException:
+                self.free_slot()
+                raise
+            with self.condition:
+                self.created[connection] = time.monotonic()
+                self.opened += 1
+        return connection
+
+    def usable(self, connection):
+        if connection.closed:
+            return False
+        if time.monotonic() - self.created[connection] > self.max_lifetime:
+            return False
+        if not self.check:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.get_transaction_status() != (
+                    TRANSACTION_STATUS_IDLE):
+                connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def release(self, connection):
+        """Возвращает соединение; незавершённая транзакция откатывается."""
+        if not connection.closed and connection.get_transaction_status() in (
+                TRANSACTION_STATUS_INTRANS, TRANSACTION_STATUS_INERROR):
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+        if (connection.closed or connection.get_transaction_status()
+                != TRANSACTION_STATUS_IDLE):
+            self.discard(connection)
+            return
+        with self.condition:
+            self.in_use -= 1
+            self.idle.append(connection)
+            self.condition.notify()
+
+    def discard(self, connection):
+        """Закрывает выданное соединение и освобождает его место."""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.created.pop(connection, None)
+        self.free_slot()
+
+    def free_slot(self):
+        with self.condition:
+            self.total -= 1
+            self.in_use -= 1
+            self.condition.notify()
+
+    def render(self):
+        """Строки метрик пула по именам из POOL_METRICS."""
+        labels = f'alias="{self.alias}"'
+        with self.condition:
+            busy = self.in_use
+            idle = len(self.idle)
+            return {
+                'foodgram_db_pool_max_size': [
+                    f'foodgram_db_pool_max_size{{{labels}}} {self.max_size}'],
+                'foodgram_db_pool_connections': [
+                    f'foodgram_db_pool_connections'
+                    f'{{{labels},state="in_use"}} {busy}',
+                    f'foodgram_db_pool_connections'
+                    f'{{{labels},state="idle"}} {idle}',
+                ],
+                'foodgram_db_pool_waiting': [
+                    f'foodgram_db_pool_waiting{{{labels}}} {self.waiting}'],
+                'foodgram_db_pool_saturation': [
+                    f'foodgram_db_pool_saturation{{{labels}}} '
+                    f'{busy / self.max_size:.3f}'],
+                'foodgram_db_pool_opened_total': [
+                    f'foodgram_db_pool_opened_total{{{labels}}} '
+                    f'{self.opened}'],
+                'foodgram_db_pool_timeouts_total': [
+                    f'foodgram_db_pool_timeouts_total{{{labels}}} '
+                    f'{self.timeouts}'],
+                'foodgram_db_pool_wait_seconds': self.wait.render(
+                    'foodgram_db_pool_wait_seconds', labels),
+            }
+
+
+pools = {}
+pools_lock = Lock()
+
+POOL_METRICS = (
+    ('foodgram_db_pool_max_size', 'gauge', 'Размер пула'),
+    ('foodgram_db_pool_connections', 'gauge',
+     'Открытые соединения пула по состоянию'),
+    ('foodgram_db_pool_waiting', 'gauge', 'Потоки, ждущие соединения'),
+    ('foodgram_db_pool_saturation', 'gauge', 'Доля занятых соединений'),
+    ('foodgram_db_pool_opened_total', 'counter', 'Открыто соединений'),
+    ('foodgram_db_pool_timeouts_total', 'counter',
+     'Отказы по таймауту ожидания'),
+    ('foodgram_db_pool_wait_seconds', 'histogram',
+     'Ожидание соединения из пула'),
+)
+
+
+def get_pool(alias, options, check):
+    with pools_lock:
+        if alias not in pools:
+            pools[alias] = ConnectionPool(alias, check=check, **options)
+        return pools[alias]
+
+
+def render_pools():
+    rendered = [pool.render() for pool in list(pools.values())]
+    lines = []
+    if rendered:
+        for name, kind, help_text in POOL_METRICS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for metrics in rendered:
+                lines += metrics[name]
+    return lines
+
+
+registry.collectors.append(render_pools)
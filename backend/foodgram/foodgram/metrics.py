@@ -0,0 +1,139 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from threading import Lock
+
+from rest_framework import serializers
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                0.5, 1, 2.5, 5)
+
+current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.serializing = 0
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - started
+            self.queries += 1
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name, labels):
+        lines = []
+        total = 0
+        for bound, count in zip([*self.buckets, '+Inf'], self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {total}')
+        return lines
+
+
+class Registry:
+    """Накопленные в процессе метрики в текстовом формате Prometheus."""
+
+    histograms = {
+        'foodgram_request_duration_seconds': (
+            'Время обработки запроса', DURATION_BUCKETS, 'total'),
+        'foodgram_request_sql_seconds': (
+            'Время SQL-запросов за запрос', DURATION_BUCKETS, 'sql'),
+        'foodgram_request_serialize_seconds': (
+            'Время сериализации и рендеринга ответа', DURATION_BUCKETS,
+            'serialization'),
+        'foodgram_request_queries': (
+            'Число SQL-запросов за запрос', QUERY_BUCKETS, 'queries'),
+    }
+
+    def __init__(self):
+        self.lock = Lock()
+        self.requests = defaultdict(int)
+        self.series = defaultdict(dict)
+        # Функции, возвращающие дополнительные строки метрик.
+        self.collectors = []
+
+    def observe(self, view, method, status, values):
+        with self.lock:
+            self.requests[view, method, status] += 1
+            for name, (_, buckets, field) in self.histograms.items():
+                histogram = self.series[name].get((view, method))
+                if histogram is None:
+                    histogram = self.series[name][view, method] = Histogram(
+                        buckets)
+                histogram.observe(values[field])
+
+    def render(self):
+        lines = [
+            '# HELP foodgram_requests_total Число обработанных запросов',
+            '# TYPE foodgram_requests_total counter',
+        ]
+        with self.lock:
+            for (view, method, status), count in sorted(
+                    self.requests.items()):
+                lines.append(
+                    f'foodgram_requests_total{{view="{view}",'
+                    f'method="{method}",status="{status}"}} {count}')
+            for name, (help_text, buckets, _) in self.histograms.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (view, method), histogram in sorted(
+                        self.series[name].items()):
+                    lines += histogram.render(
+                        name, f'view="{view}",method="{method}"')
+        for collector in self.collectors:
+            lines += collector()
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def timed_data(prop):
+    """Учитывает время внешнего вызова serializer.data в запросе."""
+
+    def data(self):
+        metrics = current.get()
+        if metrics is None:
+            return prop.fget(self)
+        metrics.serializing += 1
+        started = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            metrics.serializing -= 1
+            if not metrics.serializing:
+                metrics.serialize += time.perf_counter() - started
+
+    data.instrumented = True
+    return property(data)
+
+
+def instrument_serializers():
+    for serializer in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(serializer.data.fget, 'instrumented', False):
+            serializer.data = timed_data(serializer.data)
@@ -0,0 +1,103 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.db import connections
+
+from .metrics import RequestMetrics, current, instrument_serializers, registry
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """Считает запросы к БД, время SQL, сериализации и всего запроса.
+
+    Пишет заголовок Server-Timing, логирует медленные запросы и копит
+    гистограммы для /metrics.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        instrument_serializers()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                self.wrap_connections(stack, metrics)
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        # Соединения локальны для потока, а асинхронный ORM выполняет
+        # запросы в потоке sync_to_async этого запроса: обёртки ставятся
+        # и снимаются там же.
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        stack = ExitStack()
+        try:
+            await sync_to_async(self.wrap_connections)(stack, metrics)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    def wrap_connections(self, stack, metrics):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics.execute))
+
+    def process_template_response(self, request, response):
+        metrics = current.get()
+        started = time.perf_counter()
+
+        def rendered(response):
+            metrics.render += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        serialization = metrics.serialize + metrics.render
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.sql * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'serialize;dur={serialization * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        registry.observe(view, request.method, response.status_code, {
+            'total': total,
+            'sql': metrics.sql,
+            'serialization': serialization,
+            'queries': metrics.queries,
+        })
+        if (total >= settings.SLOW_REQUEST_SECONDS
+                or metrics.queries >= settings.SLOW_REQUEST_QUERIES):
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, запросов к БД %d '
+                '(%.0f мс), сериализация %.0f мс',
+                request.method, request.get_full_path(), view,
+                total * 1000, metrics.queries, metrics.sql * 1000,
+                serialization * 1000
+            )
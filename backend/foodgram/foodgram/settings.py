@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +65,16 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 
+# Пул соединений в каждом воркере; всего соединений до базы или
+# pgbouncer не больше DB_POOL_SIZE * число воркеров.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', default=0))
+
+# Секунды жизни соединения, None - без ограничения. С пулом соединение
+# возвращается в него после каждого запроса, поэтому по умолчанию 0.
+CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE',
+                         default='0' if DB_POOL_SIZE else '60')
+CONN_MAX_AGE = None if CONN_MAX_AGE == 'None' else int(CONN_MAX_AGE)
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
@@ -70,10 +82,74 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='True') == 'True',
+        # За pgbouncer в режиме transaction серверные курсоры iterator()
+        # не переживают границу транзакции. Часовой пояс базы или
+        # pgbouncer должен быть UTC, иначе Django выполняет SET TIME ZONE
+        # на уровне сессии.
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DB_PGBOUNCER', default='False') == 'True',
     }
 }
 
+if DB_POOL_SIZE and DATABASES['default']['ENGINE'] == (
+        'django.db.backends.postgresql'):
+    DATABASES['default']['ENGINE'] = 'foodgram.db'
+    DATABASES['default']['OPTIONS'] = {'pool': {
+        'max_size': DB_POOL_SIZE,
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', default=10)),
+        'max_lifetime': float(
+            os.getenv('DB_POOL_MAX_LIFETIME', default=3600)),
+    }}
+
+# Версии коллекций и корзин хранятся в кеше: при нескольких воркерах
+# нужен общий бэкенд (Redis, Memcached), а не локальная память.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=50))
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', default=300))
+
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', default='russian')
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+SHOPPING_LIST_CACHE_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_CACHE_TIMEOUT', default=60 * 60 * 24))
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+MEMBERSHIP_CACHE_TIMEOUT = int(
+    os.getenv('MEMBERSHIP_CACHE_TIMEOUT', default=60 * 60 * 24))
+
+# Пороги, начиная с которых запрос попадает в лог foodgram.middleware.
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', default=0.5))
+SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', default=20))
+
+# Без токена /metrics отвечает 403.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+# Асинхронные представления для чтения; asgi.py включает их по умолчанию.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', default='False') == 'True'
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
+IMAGE_VARIANTS_DIR = 'recipes/variants'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
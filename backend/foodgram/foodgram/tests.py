@@ -0,0 +1,182 @@
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+from psycopg2 import OperationalError
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_INERROR,
+    TRANSACTION_STATUS_INTRANS,
+)
+
+from foodgram.db.pool import ConnectionPool, PoolTimeout, pools
+from foodgram.metrics import registry
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise OperationalError('server closed the connection')
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.status = TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def make_pool(self, **kwargs):
+        kwargs.setdefault('timeout', 0.05)
+        pool = ConnectionPool('test', 2, **kwargs)
+        pools['test'] = pool
+        self.addCleanup(pools.pop, 'test', None)
+        return pool
+
+    def test_released_connection_is_reused(self):
+        pool = self.make_pool()
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        self.assertIs(pool.acquire(FakeConnection), connection)
+        self.assertEqual(pool.opened, 1)
+        self.assertEqual(pool.in_use, 1)
+
+    def test_exhausted_pool_times_out(self):
+        pool = self.make_pool()
+        pool.acquire(FakeConnection)
+        pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        self.assertEqual(pool.timeouts, 1)
+        self.assertEqual(pool.waiting, 0)
+        self.assertEqual(pool.total, 2)
+
+    def test_waiter_gets_released_connection(self):
+        pool = self.make_pool(timeout=5)
+        first = pool.acquire(FakeConnection)
+        pool.acquire(FakeConnection)
+
+        def release():
+            time.sleep(0.05)
+            pool.release(first)
+
+        thread = threading.Thread(target=release)
+        thread.start()
+        self.assertIs(pool.acquire(FakeConnection), first)
+        thread.join()
+        self.assertEqual(sum(pool.wait.counts), 3)
+
+    def test_open_transaction_is_rolled_back_on_release(self):
+        for status in (TRANSACTION_STATUS_INTRANS,
+                       TRANSACTION_STATUS_INERROR):
+            pool = self.make_pool()
+            connection = pool.acquire(FakeConnection)
+            connection.status = status
+            pool.release(connection)
+            self.assertEqual(connection.rollbacks, 1)
+            self.assertFalse(connection.closed)
+            self.assertIs(pool.acquire(FakeConnection), connection)
+
+    def test_closed_connection_is_not_returned(self):
+        pool = self.make_pool()
+        connection = pool.acquire(FakeConnection)
+        connection.close()
+        pool.release(connection)
+        self.assertEqual((pool.total, pool.in_use, len(pool.idle)),
+                         (0, 0, 0))
+
+    def test_discard_frees_slot(self):
+        pool = self.make_pool()
+        connection = pool.acquire(FakeConnection)
+        pool.acquire(FakeConnection)
+        pool.discard(connection)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.acquire(FakeConnection), connection)
+        self.assertEqual(pool.opened, 3)
+
+    def test_failed_connect_frees_slot(self):
+        pool = self.make_pool()
+
+        def connect():
+            raise OperationalError('could not connect to server')
+
+        for _ in range(3):
+            with self.assertRaises(OperationalError):
+                pool.acquire(connect)
+        self.assertEqual((pool.total, pool.in_use), (0, 0))
+
+    def test_expired_connection_is_replaced(self):
+        pool = self.make_pool(max_lifetime=0)
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        time.sleep(0.01)
+        self.assertIsNot(pool.acquire(FakeConnection), connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.total, 1)
+
+    def test_health_check_replaces_broken_connection(self):
+        pool = self.make_pool(check=True)
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection)
+        connection.broken = True
+        self.assertIsNot(pool.acquire(FakeConnection), connection)
+        self.assertEqual(pool.total, 1)
+
+    def test_metrics(self):
+        pool = self.make_pool()
+        pool.acquire(FakeConnection)
+        pool.release(pool.acquire(FakeConnection))
+        text = registry.render()
+        self.assertIn('# TYPE foodgram_db_pool_saturation gauge', text)
+        self.assertIn('foodgram_db_pool_saturation{alias="test"} 0.500',
+                      text)
+        self.assertIn(
+            'foodgram_db_pool_connections{alias="test",state="idle"} 1',
+            text)
+        self.assertIn('foodgram_db_pool_wait_seconds_count{alias="test"} 2',
+                      text)
+
+
+class MetricsViewTests(SimpleTestCase):
+
+    def get(self, **headers):
+        return self.client.get('/metrics', **headers).status_code
+
+    @override_settings(METRICS_TOKEN='')
+    def test_closed_without_token(self):
+        self.assertEqual(self.get(), 403)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer '), 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required(self):
+        self.assertEqual(self.get(), 403)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer wrong'), 403)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer тест'), 403)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer secret'), 200)
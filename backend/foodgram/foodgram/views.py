@@ -0,0 +1,15 @@
+from secrets import compare_digest
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metrics import registry
+
+
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '').encode()
+    if not token or not compare_digest(header, f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
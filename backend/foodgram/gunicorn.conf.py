@@ -0,0 +1,14 @@
+import os
+
+# wsgi - синхронные воркеры gunicorn; asgi - воркеры uvicorn, на которых
+# чтение обслуживают асинхронные представления (см. foodgram/asgi.py).
+server_profile = os.getenv('SERVER_PROFILE', default='wsgi')
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', default=1))
+
+if server_profile == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
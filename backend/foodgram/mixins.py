@@ -0,0 +1,45 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def conditional_headers(key, last_modified):
+    etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+    return etag, int(last_modified)
+
+
+def set_conditional_headers(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 Not Modified до сериализации.
+
+    Наследник возвращает из get_validators() строку, однозначно описывающую
+    состояние ответа, и время последнего изменения в секундах.
+    """
+
+    def get_validators(self, request):
+        return None
+
+    def conditional(self, handler, request, *args, **kwargs):
+        validators = self.get_validators(request)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        etag, last_modified = conditional_headers(*validators)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return set_conditional_headers(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
@@ -1,6 +1,13 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import F
 
+from .counters import counters_changed
 from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .shopping_list import (
+    add_recipe, change_recipe, recipe_amounts, remove_recipe,
+)
+from .signals import recipe_changed
 
 
 @admin.register(Ingredient)
@@ -16,7 +23,8 @@ class IngredientsInRow(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'author', 'favorites']
+    list_display = ['id', 'name', 'author', 'favorites', 'in_carts_count']
+    list_select_related = ['author']
     search_fields = ['name', 'author__username']
     list_filter = ['tags']
     empty_value_display = 'пусто'
@@ -24,15 +32,66 @@ class RecipeAdmin(admin.ModelAdmin):
         IngredientsInRow,
     )
 
+    @admin.display(description='В избранном', ordering='favorites_count')
     def favorites(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
+
+    @transaction.atomic
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = recipe_amounts(recipe.pk)
+        super().save_related(request, form, formsets, change)
+        new_amounts = recipe_amounts(recipe.pk)
+        if old_amounts != new_amounts:
+            change_recipe(recipe.pk, old_amounts, new_amounts)
+        recipe_changed.send(sender=Recipe, recipe=recipe,
+                            ingredients_changed=old_amounts != new_amounts)
+
+
+class RecipeCounterAdmin(admin.ModelAdmin):
+    counter = None
+
+    def on_add(self, obj):
+        Recipe.objects.filter(pk=obj.recipe_id).update(
+            **{self.counter: F(self.counter) + 1})
+        counters_changed()
+
+    def on_remove(self, obj):
+        Recipe.objects.filter(pk=obj.recipe_id).update(
+            **{self.counter: F(self.counter) - 1})
+        counters_changed()
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            self.on_remove(self.model.objects.get(pk=obj.pk))
+        super().save_model(request, obj, form, change)
+        self.on_add(obj)
+
+    def delete_model(self, request, obj):
+        self.on_remove(obj)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.on_remove(obj)
+        super().delete_queryset(request, queryset)
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(RecipeCounterAdmin):
     list_display = ['id', 'user', 'recipe']
     search_fields = ['user__username', 'user__email']
     empty_value_display = 'пусто'
+    counter = 'in_carts_count'
+
+    def on_add(self, obj):
+        super().on_add(obj)
+        add_recipe(obj.user_id, obj.recipe_id)
+
+    def on_remove(self, obj):
+        super().on_remove(obj)
+        remove_recipe(obj.user_id, obj.recipe_id)
 
 
 @admin.register(Tag)
@@ -43,7 +102,8 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(RecipeCounterAdmin):
     list_display = ['id', 'user', 'recipe']
     search_fields = ['user__username', 'user__email']
     empty_value_display = 'пусто'
+    counter = 'favorites_count'
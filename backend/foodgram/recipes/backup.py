@@ -0,0 +1,163 @@
+import gzip
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+
+from users.models import Subscription, User
+from .models import (
+    Favorite, ImportedRecipe, Ingredient, Recipe, RecipeIngredients,
+    RecipeTag, ShoppingCart, Tag,
+)
+from .generator import explicit_values
+from .search import update_search_vector
+
+EXPORTS = [
+    ('recipe', Recipe.objects.values(
+        'id', 'author__email', 'name', 'text', 'cooking_time', 'image',
+        'image_variants', 'pub_date')),
+    ('ingredient', RecipeIngredients.objects.values(
+        'recipe_id', 'ingredient__name', 'ingredient__measurement_unit',
+        'amount')),
+    ('tag', RecipeTag.objects.values('recipe_id', 'tag__slug')),
+    ('favorite', Favorite.objects.values('user__email', 'recipe_id')),
+    ('cart', ShoppingCart.objects.values('user__email', 'recipe_id')),
+    ('subscription', Subscription.objects.values(
+        'user__email', 'author__email')),
+]
+
+
+class DumpEncoder(DjangoJSONEncoder):
+    """Даты с микросекундами: DjangoJSONEncoder обрезает их до миллисекунд."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def open_dump(path, mode):
+    opener = gzip.open if path.endswith('.gz') else open
+    return opener(path, mode + 't', encoding='utf-8')
+
+
+def export_records(chunk_size):
+    """Строки NDJSON: сначала рецепты, затем их связи."""
+    encoder = DumpEncoder(ensure_ascii=False)
+    for name, queryset in EXPORTS:
+        for row in queryset.order_by('pk').iterator(chunk_size):
+            yield name, encoder.encode({'model': name, **row}) + '\n'
+
+
+class RecipeRestorer:
+    """Восстанавливает пачку записей дампа с переназначением ключей.
+
+    Соответствие идентификаторов рецептов дампа и базы хранится в
+    ImportedRecipe той же транзакцией, что и пачка: рецепты, уже
+    загруженные в recipe_import, повторно не создаются. Пользователи,
+    тэги и ингредиенты ищутся по естественным ключам.
+    """
+
+    def __init__(self, recipe_import):
+        self.recipe_import = recipe_import
+        self.recipe_ids = dict(recipe_import.recipes.values_list(
+            'source_id', 'recipe_id'))
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        }
+        self.skipped = 0
+
+    def restore(self, records):
+        """Сохраняет пачку, возвращает новые пары идентификаторов рецептов."""
+        groups = {name: [] for name, _ in EXPORTS}
+        for record in records:
+            groups[record.pop('model')].append(record)
+        emails = {
+            record[field]
+            for name in ('recipe', 'favorite', 'cart', 'subscription')
+            for record in groups[name]
+            for field in ('author__email', 'user__email')
+            if field in record
+        }
+        self.users = dict(User.objects.filter(
+            email__in=emails).values_list('email', 'id'))
+
+        mapped = self.restore_recipes(groups['recipe'])
+        self.create(RecipeIngredients, [
+            {'recipe_id': record['recipe_id'],
+             'ingredient_id': self.ingredients.get((
+                 record['ingredient__name'],
+                 record['ingredient__measurement_unit'])),
+             'amount': record['amount']}
+            for record in groups['ingredient']
+        ])
+        self.create(RecipeTag, [
+            {'recipe_id': record['recipe_id'],
+             'tag_id': self.tags.get(record['tag__slug'])}
+            for record in groups['tag']
+        ])
+        for name, model in (('favorite', Favorite), ('cart', ShoppingCart)):
+            self.create(model, [
+                {'user_id': self.users.get(record['user__email']),
+                 'recipe_id': record['recipe_id']}
+                for record in groups[name]
+            ])
+        self.create(Subscription, [
+            {'user_id': self.users.get(record['user__email']),
+             'author_id': self.users.get(record['author__email'])}
+            for record in groups['subscription']
+        ])
+        update_search_vector([pk for _, pk in mapped])
+        return mapped
+
+    def restore_recipes(self, records):
+        records = [
+            record for record in records
+            if record['id'] not in self.recipe_ids
+            and self.keep(record['author__email'] in self.users)
+        ]
+        with explicit_values(Recipe, ['pub_date']):
+            recipes = Recipe.objects.bulk_create([
+                Recipe(author_id=self.users[record['author__email']],
+                       name=record['name'], text=record['text'],
+                       cooking_time=record['cooking_time'],
+                       image=record['image'],
+                       image_variants=record['image_variants'],
+                       pub_date=parse_datetime(record['pub_date']))
+                for record in records
+            ])
+        mapped = [
+            (record['id'], recipe.pk)
+            for recipe, record in zip(recipes, records)
+        ]
+        ImportedRecipe.objects.bulk_create([
+            ImportedRecipe(recipe_import=self.recipe_import,
+                           source_id=old, recipe_id=new)
+            for old, new in mapped
+        ])
+        self.recipe_ids.update(mapped)
+        return mapped
+
+    def create(self, model, rows):
+        objects = []
+        for row in rows:
+            if 'recipe_id' in row:
+                row['recipe_id'] = self.recipe_ids.get(row['recipe_id'])
+            if self.keep(all(value is not None for value in row.values())):
+                objects.append(model(**row))
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+
+    def keep(self, resolved):
+        if not resolved:
+            self.skipped += 1
+        return resolved
+
+
+def read_records(file, start=0):
+    """Пары (номер строки, запись) начиная со строки start."""
+    for number, line in enumerate(file):
+        if number >= start and line.strip():
+            yield number, json.loads(line)
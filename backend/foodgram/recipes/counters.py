@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .versions import COUNTERS_VERSION, bump_version
+
+# Счётчики рецептов, по которым можно сортировать ленту.
+COUNTER_FIELDS = {'favorites_count', 'in_carts_count'}
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def counters_changed():
+    transaction.on_commit(lambda: bump_version(COUNTERS_VERSION))
+
+
+def recount(model, counters, batch_size, dry_run=False):
+    """Пересчитывает счётчики пачками по диапазонам первичного ключа.
+
+    counters - словарь {поле счётчика: (связанная модель, поле связи)}
+    или {поле: выражение} для значений, которые считаются не через Count.
+    Возвращает число строк, в которых счётчики разошлись.
+    """
+    expressions = {
+        field: count_subquery(*spec) if isinstance(spec, tuple) else spec
+        for field, spec in counters.items()
+    }
+    drift = Q()
+    for field in counters:
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    ids = model.objects.order_by('pk').values_list('pk', flat=True)
+    first, last = ids.first(), ids.last()
+    if first is None:
+        return 0
+
+    changed = 0
+    for start in range(first, last + 1, batch_size):
+        rows = model.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+        stale = rows.alias(**{
+            f'actual_{field}': expression
+            for field, expression in expressions.items()
+        }).filter(drift).count()
+        if stale and not dry_run:
+            rows.update(**expressions)
+        changed += stale
+    return changed
@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+from bisect import bisect_right
+from contextlib import contextmanager
+from itertools import accumulate
+
+from django.db import connection
+
+
+class ZipfSampler:
+    """Выбор элементов с популярностью, убывающей по степенному закону.
+
+    Вес элемента с рангом r равен 1 / r ** alpha; ранги назначаются
+    перемешанному списку, чтобы популярность не зависела от порядка ids.
+    """
+
+    def __init__(self, items, alpha, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.rng = rng
+        self.cumulative = list(accumulate(
+            1 / rank ** alpha for rank in range(1, len(self.items) + 1)))
+        self.total = self.cumulative[-1] if self.cumulative else 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def weight(self, index):
+        previous = self.cumulative[index - 1] if index else 0
+        return (self.cumulative[index] - previous) / self.total
+
+    def choice(self):
+        index = bisect_right(self.cumulative, self.rng.random() * self.total)
+        return self.items[min(index, len(self.items) - 1)]
+
+    def sample(self, count, exclude=None):
+        """count разных элементов; при нехватке - сколько удалось найти."""
+        count = min(count, len(self.items) - (exclude is not None))
+        chosen = set()
+        attempts = 0
+        while len(chosen) < count and attempts < count * 20:
+            item = self.choice()
+            if item != exclude:
+                chosen.add(item)
+            attempts += 1
+        return list(chosen)
+
+    def shares(self, total):
+        """Распределяет total по элементам пропорционально весам."""
+        for index, item in enumerate(self.items):
+            expected = total * self.weight(index)
+            count = int(expected)
+            if self.rng.random() < expected - count:
+                count += 1
+            yield item, count
+
+
+@contextmanager
+def explicit_values(model, fields):
+    """Отключает auto_now/auto_now_add у явно переданных полей."""
+    flags = {
+        field: (field.auto_now, field.auto_now_add)
+        for field in model._meta.concrete_fields
+        if field.attname in fields and hasattr(field, 'auto_now_add')
+    }
+    for field in flags:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in flags.items():
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class BulkWriter:
+    """Вставляет строки пачками: COPY на PostgreSQL, иначе bulk_create."""
+
+    def __init__(self, use_copy):
+        self.use_copy = use_copy
+
+    def insert(self, model, fields, rows, returning=False):
+        """fields - имена атрибутов (author_id, а не author)."""
+        if not rows:
+            return []
+        if self.use_copy:
+            return self.copy(model, fields, rows, returning)
+        with explicit_values(model, fields):
+            objects = model.objects.bulk_create(
+                [model(**dict(zip(fields, row))) for row in rows])
+        return [obj.pk for obj in objects] if returning else []
+
+    def copy(self, model, fields, rows, returning):
+        opts = model._meta
+        concrete = {field.attname: field for field in opts.concrete_fields}
+        missing = [
+            field for field in opts.concrete_fields
+            if field.attname not in fields and not field.primary_key
+        ]
+        columns = [concrete[field].column for field in fields]
+        columns += [field.column for field in missing]
+        ids = []
+        with connection.cursor() as cursor:
+            if returning:
+                cursor.execute(
+                    'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                    'FROM generate_series(1, %s)',
+                    [opts.db_table, opts.pk.column, len(rows)]
+                )
+                ids = [row[0] for row in cursor.fetchall()]
+                columns.insert(0, opts.pk.column)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for index, row in enumerate(rows):
+                obj = model(**dict(zip(fields, row)))
+                values = [*row, *(field.pre_save(obj, True)
+                                  for field in missing)]
+                if returning:
+                    values.insert(0, ids[index])
+                writer.writerow(copy_value(value) for value in values)
+            buffer.seek(0)
+            quote = connection.ops.quote_name
+            cursor.copy_expert(
+                f'COPY {quote(opts.db_table)} '
+                f'({", ".join(quote(column) for column in columns)}) '
+                f"FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+        return ids
+
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
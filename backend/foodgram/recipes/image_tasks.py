@@ -0,0 +1,75 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .images import render_variants
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+_lock = Lock()
+_pool = None
+_writer = None
+
+
+def get_pool():
+    global _pool, _writer
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            _writer = ThreadPoolExecutor(max_workers=1)
+    return _pool, _writer
+
+
+def needs_variants(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') != recipe.image.name)
+
+
+def variants_task(recipe_id, source):
+    return (
+        os.path.join(settings.MEDIA_ROOT, source),
+        settings.MEDIA_ROOT,
+        os.path.join(settings.IMAGE_VARIANTS_DIR, str(recipe_id),
+                     os.path.splitext(os.path.basename(source))[0]),
+    )
+
+
+def save_variants(recipe_id, source, variants):
+    return Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants={'source': source, 'variants': variants},
+        updated_at=timezone.now(),
+    )
+
+
+def save_result(recipe_id, source, future):
+    close_old_connections()
+    try:
+        save_variants(recipe_id, source, future.result())
+    except Exception:
+        logger.exception('Не удалось обработать изображение рецепта %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_variants(recipe):
+    recipe_id, source = recipe.pk, recipe.image.name
+
+    def submit():
+        pool, writer = get_pool()
+        future = pool.submit(render_variants,
+                             *variants_task(recipe_id, source))
+        future.add_done_callback(
+            lambda done: writer.submit(save_result, recipe_id, source, done))
+
+    transaction.on_commit(submit)
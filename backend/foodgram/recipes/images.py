@@ -0,0 +1,60 @@
+import os
+
+from PIL import Image, ImageOps, features
+
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+VARIANTS = {
+    'thumbnail': {'size': (160, 160), 'crop': True},
+    'card': {'size': (640, 480), 'crop': False},
+    'full': {'size': (1600, 1600), 'crop': False},
+}
+
+ENCODERS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True,
+                             'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'avif': ('AVIF', 'avif', {'quality': 60}),
+}
+
+
+def available_formats():
+    formats = ['jpeg']
+    if features.check('webp'):
+        formats.append('webp')
+    Image.init()
+    if 'AVIF' in Image.SAVE:
+        formats.append('avif')
+    return formats
+
+
+def render_variants(source_path, media_root, target_dir):
+    """Строит варианты изображения; выполняется в отдельном процессе."""
+    formats = available_formats()
+    os.makedirs(os.path.join(media_root, target_dir), exist_ok=True)
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original).convert('RGB')
+        variants = {}
+        for name, options in VARIANTS.items():
+            if options['crop']:
+                image = ImageOps.fit(original, options['size'],
+                                     Image.LANCZOS)
+            else:
+                image = original.copy()
+                image.thumbnail(options['size'], Image.LANCZOS)
+            files = {}
+            for image_format in formats:
+                pil_format, extension, params = ENCODERS[image_format]
+                path = os.path.join(target_dir, f'{name}.{extension}')
+                image.save(os.path.join(media_root, path), pil_format,
+                           **params)
+                files[image_format] = path
+            variants[name] = {
+                'width': image.width,
+                'height': image.height,
+                'files': files,
+            }
+    return variants
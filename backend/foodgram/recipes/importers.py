@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from .models import Ingredient, Tag
+from .tag_masks import assign_tag_masks
+from .versions import INGREDIENTS_VERSION, TAGS_VERSION
+
+READ_SIZE = 64 * 1024
+
+FORMATS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+class ImportTarget:
+
+    def __init__(self, model, fields, unique_fields, version,
+                 other_unique_fields=()):
+        self.model = model
+        self.fields = fields
+        self.unique_fields = unique_fields
+        self.other_unique_fields = other_unique_fields
+        self.update_fields = [
+            field for field in fields if field not in unique_fields]
+        self.version = version
+
+    def key(self, row):
+        return tuple(row[field] for field in self.unique_fields)
+
+    def clean(self, row):
+        """Возвращает строку только с полями модели или None."""
+        cleaned = {}
+        for field in self.fields:
+            value = row.get(field)
+            if not isinstance(value, str) or not value.strip():
+                return None
+            cleaned[field] = value.strip()
+        return cleaned
+
+    def without_conflicts(self, rows):
+        """Строки пачки без тех, что заняли бы чужое уникальное значение.
+
+        upsert разрешает конфликт только по unique_fields, совпадение по
+        другому уникальному полю оборвало бы загрузку IntegrityError.
+        """
+        owners = {}
+        for field in self.other_unique_fields:
+            values = {row[field] for row in rows}
+            owners[field] = {
+                value: tuple(key) for value, *key in
+                self.model.objects.filter(
+                    **{f'{field}__in': values}
+                ).values_list(field, *self.unique_fields)
+            }
+        kept = []
+        for row in rows:
+            key = self.key(row)
+            if any(owners[field].get(row[field], key) != key
+                   for field in self.other_unique_fields):
+                continue
+            for field in self.other_unique_fields:
+                owners[field][row[field]] = key
+            kept.append(row)
+        return kept
+
+    def upsert(self, rows):
+        # ignore_conflicts в Django 4.2 не принимает unique_fields и глушит
+        # любой конфликт. Без полей для обновления ключ переписывается
+        # сам собой, и ON CONFLICT срабатывает только на unique_fields.
+        return self.model.objects.bulk_create(
+            [self.model(**row) for row in rows], update_conflicts=True,
+            unique_fields=self.unique_fields,
+            update_fields=self.update_fields or self.unique_fields[:1],
+        )
+
+    def existing(self, rows):
+        """Ключи строк пачки, которые уже есть в базе."""
+        first = self.unique_fields[0]
+        values = {row[first] for row in rows}
+        return set(self.model.objects.filter(
+            **{f'{first}__in': values}
+        ).values_list(*self.unique_fields))
+
+
+class TagImportTarget(ImportTarget):
+    """bulk_create не вызывает сигналы, биты маски выдаются отдельно."""
+
+    def upsert(self, rows):
+        super().upsert(rows)
+        assign_tag_masks()
+
+
+TARGETS = {
+    'ingredients': ImportTarget(Ingredient, ['name', 'measurement_unit'],
+                                ['name', 'measurement_unit'],
+                                INGREDIENTS_VERSION),
+    'tags': TagImportTarget(Tag, ['name', 'color', 'slug'], ['slug'],
+                            TAGS_VERSION, ['name', 'color']),
+}
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return FORMATS.get(os.path.splitext(name)[1].lower())
+
+
+def detect_target(row):
+    return 'tags' if 'slug' in row else 'ingredients'
+
+
+def read_csv(file, fields=None):
+    """Строки CSV; без fields первая строка считается заголовком."""
+    if fields is None:
+        yield from csv.DictReader(file)
+        return
+    for values in csv.reader(file):
+        if values:
+            yield dict(zip(fields, values))
+
+
+def read_ndjson(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_json(file):
+    """Элементы JSON-массива верхнего уровня без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise ValueError('Ожидается JSON-массив.')
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == ']':
+            return
+        if position < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                position = end
+                continue
+        if eof:
+            raise ValueError('JSON-массив не закрыт.')
+        chunk = file.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'ndjson': read_ndjson,
+}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
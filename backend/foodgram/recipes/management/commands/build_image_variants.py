@@ -0,0 +1,43 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from recipes.image_tasks import (
+    get_pool, needs_variants, save_variants, variants_task,
+)
+from recipes.images import available_formats, render_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии изображений рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='пересобрать варианты для всех рецептов')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_variants').iterator()
+        pool, _ = get_pool()
+        futures = {}
+        for recipe in recipes:
+            if options['all'] or needs_variants(recipe):
+                source = recipe.image.name
+                future = pool.submit(render_variants,
+                                     *variants_task(recipe.pk, source))
+                futures[future] = (recipe.pk, source)
+        self.stdout.write(
+            f'Форматы: {", ".join(available_formats())}; '
+            f'рецептов к обработке: {len(futures)}'
+        )
+        failed = 0
+        for future in as_completed(futures):
+            recipe_id, source = futures[future]
+            try:
+                save_variants(recipe_id, source, future.result())
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe_id}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {len(futures) - failed}, ошибок: {failed}'))
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import live_totals
+from recipes.versions import bump_versions, cart_version_key
+
+BATCH_SIZE = 5000
+
+
+def merge(live, stored):
+    live, stored = iter(live), iter(stored)
+    left, right = next(live, None), next(stored, None)
+    while left is not None or right is not None:
+        if right is None or (left is not None and left[:2] < right[:2]):
+            yield left[0], left[1], left[2], None
+            left = next(live, None)
+        elif left is None or right[:2] < left[:2]:
+            yield right[0], right[1], None, right[2]
+            right = next(stored, None)
+        else:
+            if left[2] != right[2]:
+                yield left[0], left[1], left[2], right[2]
+            left, right = next(live, None), next(stored, None)
+
+
+class Command(BaseCommand):
+    help = ('Сверяет таблицу списков покупок с агрегацией по корзинам '
+            'и при необходимости пересобирает её.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='пересобрать таблицу из корзин')
+        parser.add_argument('--show', type=int, default=20,
+                            help='сколько расхождений вывести')
+
+    def handle(self, *args, **options):
+        stored = ShoppingListItem.objects.order_by(
+            'user_id', 'ingredient_id'
+        ).values_list('user_id', 'ingredient_id', 'total_amount')
+        users = set()
+        differences = 0
+        for user_id, ingredient_id, expected, actual in merge(
+                live_totals().iterator(BATCH_SIZE),
+                stored.iterator(BATCH_SIZE)):
+            differences += 1
+            users.add(user_id)
+            if differences <= options['show']:
+                self.stdout.write(
+                    f'user={user_id} ingredient={ingredient_id}: '
+                    f'ожидается {expected}, в таблице {actual}'
+                )
+        self.stdout.write(f'Расхождений: {differences}, '
+                          f'пользователей: {len(users)}.')
+
+        if options['rebuild']:
+            self.rebuild()
+            bump_versions(cart_version_key(user_id) for user_id in users)
+            self.stdout.write(self.style.SUCCESS('Таблица пересобрана.'))
+        elif differences:
+            raise CommandError('Таблица списков покупок рассинхронизирована.')
+
+    @transaction.atomic
+    def rebuild(self):
+        ShoppingListItem.objects.all().delete()
+        batch = []
+        for user_id, ingredient_id, total in live_totals().iterator(
+                BATCH_SIZE):
+            batch.append(ShoppingListItem(user_id=user_id,
+                                          ingredient_id=ingredient_id,
+                                          total_amount=total))
+            if len(batch) >= BATCH_SIZE:
+                ShoppingListItem.objects.bulk_create(batch)
+                batch = []
+        ShoppingListItem.objects.bulk_create(batch)
@@ -0,0 +1,27 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from recipes.backup import export_records, open_dump
+
+
+class Command(BaseCommand):
+    help = ('Выгружает рецепты, их ингредиенты и тэги, избранное, корзины '
+            'и подписки в NDJSON, при расширении .gz - со сжатием.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counts = Counter()
+        with open_dump(options['path'], 'w') as file:
+            for name, line in export_records(options['chunk_size']):
+                file.write(line)
+                counts[name] += 1
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгрузка завершена за {time.monotonic() - started:.1f} с.'))
@@ -0,0 +1,196 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes.generator import BulkWriter, ZipfSampler
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredients, RecipeTag, ShoppingCart,
+    Tag,
+)
+from recipes.search import update_search_vector
+from recipes.versions import RECIPES_VERSION, TAGS_VERSION, bump_versions
+from users.models import Subscription, User
+
+TAGS = [
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F5A623', 'dessert'),
+    ('Выпечка', '#D0021B', 'bakery'),
+    ('Вегетарианское', '#7ED321', 'vegetarian'),
+    ('Супы', '#4A90E2', 'soups'),
+    ('Салаты', '#50E3C2', 'salads'),
+]
+ADJECTIVES = [
+    'Домашний', 'Быстрый', 'Пряный', 'Летний', 'Запечённый', 'Бабушкин',
+    'Лёгкий', 'Сытный', 'Праздничный', 'Острый', 'Нежный', 'Хрустящий',
+]
+AMOUNTS = [1, 2, 3, 5, 10, 20, 50, 100, 150, 200, 250, 300, 500, 1000]
+PUBLISHED_WITHIN = timedelta(days=730)
+
+
+class Command(BaseCommand):
+    help = ('Генерирует пользователей, рецепты, избранное, корзины и '
+            'подписки со степенным распределением популярности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=50000)
+        parser.add_argument('--carts', type=int, default=5000)
+        parser.add_argument('--subscriptions', type=int, default=20000)
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='показатель степенного закона')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--no-copy', action='store_true',
+                            help='не использовать COPY на PostgreSQL')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.alpha = options['alpha']
+        self.batch_size = options['batch_size']
+        self.writer = BulkWriter(connection.vendor == 'postgresql'
+                                 and not options['no_copy'])
+        self.prefix = f'gen{options["seed"]}-'
+        if User.objects.filter(email__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Данные с --seed {options["seed"]} уже сгенерированы.')
+        ingredients = list(Ingredient.objects.values_list('id', 'name'))
+        if not ingredients:
+            raise CommandError('Сначала загрузите ингредиенты: import_data.')
+        self.ingredients = ZipfSampler(ingredients, self.alpha, self.rng)
+        self.tags = ZipfSampler(self.create_tags(), self.alpha, self.rng)
+
+        users = self.stage('Пользователи', self.create_users,
+                           options['users'])
+        recipes = self.stage('Рецепты', self.create_recipes, users,
+                             options['recipes'])
+        popular = ZipfSampler(recipes, self.alpha, self.rng)
+        for title, model, total in (
+                ('Избранное', Favorite, options['favorites']),
+                ('Корзины', ShoppingCart, options['carts'])):
+            self.stage(title, self.create_links, model, 'recipe_id', users,
+                       popular, total)
+        self.stage('Подписки', self.create_links, Subscription, 'author_id',
+                   users, ZipfSampler(users, self.alpha, self.rng),
+                   options['subscriptions'])
+        self.stage('Поисковые векторы', self.update_search, recipes)
+        call_command('recount', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        call_command('check_shopping_lists', rebuild=True, show=0,
+                     stdout=self.stdout)
+        bump_versions([RECIPES_VERSION, TAGS_VERSION])
+        self.stdout.write(self.style.SUCCESS('Генерация завершена.'))
+
+    def stage(self, title, function, *args):
+        started = time.monotonic()
+        result = function(*args)
+        elapsed = time.monotonic() - started
+        rows = len(result) if isinstance(result, list) else result
+        self.stdout.write(f'{title}: {rows} строк за {elapsed:.1f} с '
+                          f'({rows / elapsed if elapsed else rows:.0f}/с)')
+        return result
+
+    def create_tags(self):
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color})
+        self.tag_masks = dict(Tag.objects.values_list('id', 'mask'))
+        return list(self.tag_masks)
+
+    def create_users(self, total):
+        password = make_password(None)
+        ids = []
+        for start in range(0, total, self.batch_size):
+            rows = [
+                (f'{self.prefix}{number}',
+                 f'{self.prefix}{number}@example.com',
+                 f'Имя{number}', f'Фамилия{number}', password)
+                for number in range(start, min(start + self.batch_size,
+                                               total))
+            ]
+            with transaction.atomic():
+                ids += self.writer.insert(
+                    User, ['username', 'email', 'first_name', 'last_name',
+                           'password'], rows, returning=True)
+        return ids
+
+    def create_recipes(self, users, total):
+        authors = ZipfSampler(users, self.alpha, self.rng)
+        now = timezone.now()
+        ids = []
+        batch = []
+        for author_id, count in authors.shares(total):
+            for _ in range(count):
+                batch.append(self.recipe(author_id, now))
+                if len(batch) >= self.batch_size:
+                    ids += self.save_recipes(batch)
+                    batch = []
+        ids += self.save_recipes(batch)
+        return ids
+
+    def recipe(self, author_id, now):
+        ingredients = self.ingredients.sample(self.rng.randint(3, 12))
+        _, main = ingredients[0]
+        return {
+            'row': (
+                author_id,
+                f'{self.rng.choice(ADJECTIVES)} {main}'[:200],
+                'Возьмите ' + ', '.join(name for _, name in ingredients)
+                + '. Смешайте и готовьте до готовности.',
+                max(1, min(600, int(self.rng.lognormvariate(3.3, 0.6)))),
+                'recipes/images/generated.jpg',
+                now - self.rng.random() * PUBLISHED_WITHIN,
+            ),
+            'ingredients': [pk for pk, _ in ingredients],
+            'tags': self.tags.sample(self.rng.randint(1, 3)),
+        }
+
+    def save_recipes(self, batch):
+        with transaction.atomic():
+            ids = self.writer.insert(
+                Recipe, ['author_id', 'name', 'text', 'cooking_time',
+                         'image', 'pub_date', 'tag_mask'],
+                [(*recipe['row'], sum(self.tag_masks[tag_id] or 0
+                                      for tag_id in recipe['tags']))
+                 for recipe in batch], returning=True)
+            self.writer.insert(
+                RecipeIngredients, ['recipe_id', 'ingredient_id', 'amount'],
+                [(pk, ingredient_id, self.rng.choice(AMOUNTS))
+                 for pk, recipe in zip(ids, batch)
+                 for ingredient_id in recipe['ingredients']])
+            self.writer.insert(
+                RecipeTag, ['recipe_id', 'tag_id'],
+                [(pk, tag_id) for pk, recipe in zip(ids, batch)
+                 for tag_id in recipe['tags']])
+        return ids
+
+    def create_links(self, model, field, users, targets, total):
+        activity = ZipfSampler(users, self.alpha, self.rng)
+        created = 0
+        rows = []
+        for user_id, count in activity.shares(total):
+            exclude = user_id if field == 'author_id' else None
+            rows += [(user_id, target)
+                     for target in targets.sample(count, exclude)]
+            if len(rows) >= self.batch_size:
+                created += self.save_links(model, field, rows)
+                rows = []
+        return created + self.save_links(model, field, rows)
+
+    def save_links(self, model, field, rows):
+        with transaction.atomic():
+            self.writer.insert(model, ['user_id', field], rows)
+        return len(rows)
+
+    def update_search(self, recipes):
+        for start in range(0, len(recipes), self.batch_size):
+            update_search_vector(recipes[start:start + self.batch_size])
+        return recipes
@@ -0,0 +1,98 @@
+import gzip
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.importers import (
+    READERS, TARGETS, batched, detect_format, detect_target,
+)
+from recipes.versions import bump_version
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    'data', 'ingredients.csv')
+
+
+class Command(BaseCommand):
+    help = ('Потоково загружает ингредиенты или тэги из CSV, JSON '
+            'или NDJSON пачками с обновлением существующих записей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH,
+                            help='файл данных, допускается .gz')
+        parser.add_argument('--format', choices=READERS,
+                            help='формат файла, по умолчанию по расширению')
+        parser.add_argument('--model', choices=TARGETS,
+                            help='что загружать, по умолчанию по полям')
+        parser.add_argument('--header', action='store_true',
+                            help='первая строка CSV содержит имена полей')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='только разобрать файл и посчитать новые '
+                                 'записи')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or detect_format(path)
+        if file_format is None:
+            raise CommandError(f'Не удалось определить формат файла {path}.')
+        if file_format == 'csv' and not options['header']:
+            target_name = options['model'] or 'ingredients'
+        else:
+            target_name = options['model']
+
+        opener = gzip.open if path.endswith('.gz') else open
+        started = last_report = time.monotonic()
+        total = skipped = new = 0
+        with opener(path, 'rt', encoding='utf-8', newline='') as file:
+            if file_format == 'csv':
+                fields = (None if options['header']
+                          else TARGETS[target_name].fields)
+                rows = READERS['csv'](file, fields)
+            else:
+                rows = READERS[file_format](file)
+            for batch in batched(rows, options['batch_size']):
+                if target_name is None:
+                    target_name = detect_target(batch[0])
+                target = TARGETS[target_name]
+                unique = {}
+                for row in batch:
+                    row = target.clean(row) if isinstance(row, dict) else None
+                    if row is None:
+                        skipped += 1
+                        continue
+                    unique[target.key(row)] = row
+                # Строки, чьё название или цвет уже заняты другим тэгом,
+                # пропускаются так же, как строки без обязательных полей.
+                rows_to_save = target.without_conflicts(list(unique.values()))
+                skipped += len(unique) - len(rows_to_save)
+                if options['dry_run']:
+                    new += len({target.key(row) for row in rows_to_save}
+                               - target.existing(rows_to_save))
+                else:
+                    with transaction.atomic():
+                        target.upsert(rows_to_save)
+                total += len(batch)
+                now = time.monotonic()
+                if now - last_report >= 1:
+                    last_report = now
+                    self.report(total, skipped, now - started)
+
+        if target_name is None:
+            self.stdout.write('Файл пуст.')
+            return
+        self.report(total, skipped, time.monotonic() - started)
+        if options['dry_run']:
+            self.stdout.write(f'Новых записей: {new}. Изменения не '
+                              f'сохранены.')
+            return
+        bump_version(TARGETS[target_name].version)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка завершена ({target_name}).'))
+
+    def report(self, total, skipped, elapsed):
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(f'Обработано {total} строк, пропущено {skipped}, '
+                          f'{rate:.0f} строк/с')
@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.backup import RecipeRestorer, open_dump, read_records
+from recipes.importers import batched
+from recipes.models import RecipeImport
+from recipes.versions import RECIPES_VERSION, bump_version
+
+
+class Command(BaseCommand):
+    help = ('Загружает дамп export_recipes пачками с новыми '
+            'идентификаторами рецептов. Прерванную загрузку можно '
+            'продолжить с контрольной точки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--name',
+                            help='имя загрузки для контрольной точки, по '
+                                 'умолчанию полный путь к дампу')
+        parser.add_argument('--restart', action='store_true',
+                            help='начать заново, забыв контрольную точку')
+
+    def handle(self, *args, **options):
+        name = options['name'] or os.path.abspath(options['path'])
+        if options['restart']:
+            RecipeImport.objects.filter(name=name).delete()
+        # Строка контрольной точки и соответствие идентификаторов пишутся
+        # в базу вместе с пачкой, поэтому после сбоя пачка либо
+        # загружена целиком и отмечена, либо не загружена вовсе.
+        recipe_import, _ = RecipeImport.objects.get_or_create(name=name)
+        if recipe_import.line:
+            self.stdout.write(f'Продолжение со строки {recipe_import.line}.')
+
+        restorer = RecipeRestorer(recipe_import)
+        started = time.monotonic()
+        total = 0
+        with open_dump(options['path'], 'r') as file:
+            for batch in batched(read_records(file, recipe_import.line),
+                                 options['batch_size']):
+                with transaction.atomic():
+                    restorer.restore([record for _, record in batch])
+                    recipe_import.line = batch[-1][0] + 1
+                    recipe_import.save(update_fields=['line'])
+                total += len(batch)
+                rate = total / (time.monotonic() - started)
+                self.stdout.write(f'Загружено {total} записей, '
+                                  f'{rate:.0f} записей/с')
+
+        self.stdout.write(f'Пропущено записей без связанных объектов: '
+                          f'{restorer.skipped}.')
+        call_command('recount', stdout=self.stdout)
+        call_command('check_shopping_lists', rebuild=True, show=0,
+                     stdout=self.stdout)
+        bump_version(RECIPES_VERSION)
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена.'))
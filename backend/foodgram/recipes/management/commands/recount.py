@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import counters_changed, recount
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.tag_masks import assign_tag_masks, tag_mask_subquery
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики избранного, '
+            'корзин и рецептов пользователей и маски тэгов рецептов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='только показать расхождения')
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            assign_tag_masks()
+        targets = [
+            (Recipe, {
+                'favorites_count': (Favorite, 'recipe'),
+                'in_carts_count': (ShoppingCart, 'recipe'),
+                'tag_mask': tag_mask_subquery(),
+            }),
+            (User, {'recipes_count': (Recipe, 'author')}),
+        ]
+        for model, counters in targets:
+            with transaction.atomic():
+                changed = recount(model, counters, options['batch_size'],
+                                  options['dry_run'])
+                if changed and not options['dry_run']:
+                    counters_changed()
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'расхождений {changed}'
+            )
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
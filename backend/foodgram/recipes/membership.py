@@ -0,0 +1,79 @@
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models import Subscription
+from .models import Favorite, ShoppingCart
+from .versions import (
+    cart_version_key,
+    favorites_version_key,
+    aget_version,
+    get_version,
+    subscriptions_version_key,
+)
+
+FAVORITES = 'favorites'
+CART = 'cart'
+SUBSCRIPTIONS = 'subscriptions'
+
+SOURCES = {
+    FAVORITES: (Favorite, 'recipe_id', favorites_version_key),
+    CART: (ShoppingCart, 'recipe_id', cart_version_key),
+    SUBSCRIPTIONS: (Subscription, 'author_id', subscriptions_version_key),
+}
+
+
+def load_membership(user_id, kind):
+    """Идентификаторы рецептов или авторов, связанных с пользователем.
+
+    В кэше множество хранится отсортированным массивом чисел под ключом
+    с версией, поэтому запись в избранное, корзину или подписки
+    инвалидирует его повышением версии.
+    """
+    model, field, version_key = SOURCES[kind]
+    key = f'membership:{kind}:{user_id}:{get_version(version_key(user_id))}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = array('q', sorted(model.objects.filter(
+            user_id=user_id).values_list(field, flat=True)))
+        cache.set(key, ids, settings.MEMBERSHIP_CACHE_TIMEOUT)
+    return frozenset(ids)
+
+
+def get_membership(request, kind):
+    """Множество для текущего пользователя, загружается раз за запрос."""
+    if request is None or request.user.is_anonymous:
+        return frozenset()
+    memo = request.__dict__.setdefault('_membership', {})
+    if kind not in memo:
+        memo[kind] = load_membership(request.user.id, kind)
+    return memo[kind]
+
+
+async def aload_membership(user_id, kind):
+    model, field, version_key = SOURCES[kind]
+    version = await aget_version(version_key(user_id))
+    key = f'membership:{kind}:{user_id}:{version}'
+    ids = await cache.aget(key)
+    if ids is None:
+        ids = array('q', sorted([
+            pk async for pk in model.objects.filter(
+                user_id=user_id).values_list(field, flat=True)
+        ]))
+        await cache.aset(key, ids, settings.MEMBERSHIP_CACHE_TIMEOUT)
+    return frozenset(ids)
+
+
+async def aprefetch_membership(request, kinds):
+    """Заполняет кэш запроса для get_membership из асинхронного кода.
+
+    Сериализаторы после этого берут множества из памяти и не обращаются
+    к базе синхронно.
+    """
+    if request.user.is_anonymous:
+        return
+    memo = request.__dict__.setdefault('_membership', {})
+    for kind in kinds:
+        if kind not in memo:
+            memo[kind] = await aload_membership(request.user.id, kind)
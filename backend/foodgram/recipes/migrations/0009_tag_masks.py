@@ -0,0 +1,40 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_masks(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeTag = apps.get_model('recipes', 'RecipeTag')
+    tags = list(Tag.objects.order_by('pk'))
+    if len(tags) > 63:
+        raise ValueError('Тэгов не может быть больше 63.')
+    for bit, tag in enumerate(tags):
+        tag.mask = 1 << bit
+    Tag.objects.bulk_update(tags, ['mask'])
+    Recipe.objects.update(tag_mask=Coalesce(Subquery(
+        RecipeTag.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe').annotate(total=Sum('tag__mask')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='mask',
+            field=models.BigIntegerField(editable=False, null=True, unique=True, verbose_name='Бит в маске рецептов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Маска тэгов'),
+        ),
+        migrations.RunPython(fill_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Дамп')),
+                ('line', models.PositiveBigIntegerField(default=0, verbose_name='Следующая строка')),
+            ],
+            options={
+                'verbose_name': 'Загрузка рецептов',
+                'verbose_name_plural': 'Загрузки рецептов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportedRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_id', models.BigIntegerField(verbose_name='Идентификатор в дампе')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Рецепт')),
+                ('recipe_import', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipes', to='recipes.recipeimport', verbose_name='Загрузка')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='importedrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe_import', 'source_id'), name='imported_recipe_unique'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations
+
+import recipes.models
+from recipes.operations import AddPostgresIndex, RunPostgresSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_import'),
+    ]
+
+    operations = [
+        RunPostgresSQL(
+            sql="""
+                CREATE FUNCTION recipe_tag_bits(mask bigint)
+                RETURNS integer[] LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+                    SELECT coalesce(array_agg(bit), '{}')
+                    FROM generate_series(0, 62) AS bit
+                    WHERE mask & (1::bigint << bit) <> 0
+                $$
+            """,
+            reverse_sql='DROP FUNCTION recipe_tag_bits(bigint)',
+        ),
+        AddPostgresIndex(
+            model_name='recipe',
+            index=GinIndex(recipes.models.TagBits('tag_mask'), name='recipe_tag_bits_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+from recipes.operations import AddPostgresConstraint, AlterPostgresField
+
+UNIQUE_INDEX = ('CREATE UNIQUE INDEX "ingredient_name_unit_unique" '
+                'ON "recipes_ingredient" ("name", "measurement_unit")')
+
+
+def add_unique_index(apps, schema_editor):
+    # SQLite пересоздаёт таблицу при смене уникальности и не может
+    # повторить индекс text_pattern_ops из 0010. Уникальность названия там
+    # остаётся, а ON CONFLICT импорта получает индекс по паре полей.
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.execute(UNIQUE_INDEX)
+
+
+def drop_unique_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.execute('DROP INDEX "ingredient_name_unit_unique"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_tag_bits_idx'),
+    ]
+
+    operations = [
+        AlterPostgresField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(max_length=200, verbose_name='Название ингредиента'),
+        ),
+        AddPostgresConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='ingredient_name_unit_unique'),
+        ),
+        migrations.RunPython(add_unique_index, drop_unique_index),
+    ]
@@ -1,7 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models import UniqueConstraint
+from django.db.models import Func, UniqueConstraint
+from django.db.models.functions import Lower
 
 User = get_user_model()
 
@@ -17,6 +21,8 @@ class Tag(models.Model):
     slug = models.SlugField('Slug',
                             unique=True,
                             max_length=200)
+    mask = models.BigIntegerField('Бит в маске рецептов', unique=True,
+                                  null=True, editable=False)
 
     class Meta:
         ordering = ['name']
@@ -40,6 +46,21 @@ class Ingredient(models.Model):
         verbose_name_plural = 'Ингредиенты'
         constraints = [UniqueConstraint(fields=['name', 'measurement_unit'],
                                         name='ingredient_name_unit_unique')]
+        indexes = [
+            models.Index(OpClass(Lower('name'), name='text_pattern_ops'),
+                         name='ingredient_lower_name_idx'),
+        ]
+
+
+class TagBits(Func):
+    """Номера установленных битов маски тэгов, функция из миграции 0012.
+
+    По этому выражению построен GIN-индекс, поэтому фильтр по тэгам
+    через && и @> не читает таблицу целиком.
+    """
+
+    function = 'recipe_tag_bits'
+    output_field = ArrayField(models.IntegerField())
 
 
 class Recipe(models.Model):
@@ -62,6 +83,8 @@ class Recipe(models.Model):
         verbose_name='Автор'
     )
     image = models.ImageField('Изображение', upload_to='recipes/images/')
+    image_variants = models.JSONField('Варианты изображения', default=dict,
+                                      editable=False)
     name = models.CharField('Название рецепта', max_length=200)
     text = models.TextField('Описание для рецепта',
                             help_text='Введите описание блюда')
@@ -75,11 +98,30 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации', auto_now_add=True,
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False)
+    in_carts_count = models.PositiveIntegerField(
+        'В корзинах', default=0, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    tag_mask = models.BigIntegerField('Маска тэгов', default=0,
+                                      editable=False)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+            GinIndex(fields=['search_vector'],
+                     name='recipe_search_vector_idx'),
+            GinIndex(fields=['name'], name='recipe_name_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+            GinIndex(TagBits('tag_mask'), name='recipe_tag_bits_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -129,7 +171,8 @@ class Favorite(models.Model):
                              related_name='favorites')
 
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE,
-                               verbose_name='Рецепт', related_name='favorites')
+                               verbose_name='Рецепт', related_name='favorites',
+                               db_index=False)
 
     class Meta:
         constraints = [
@@ -137,6 +180,10 @@ class Favorite(models.Model):
                              name='user_favorite_unique'
                              )
         ]
+        indexes = [
+            models.Index(fields=['recipe', 'user'],
+                         name='favorite_recipe_user_idx'),
+        ]
 
 
 class ShoppingCart(models.Model):
@@ -147,7 +194,8 @@ class ShoppingCart(models.Model):
     )
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE,
-        verbose_name='Рецепт', related_name='shopping_cart'
+        verbose_name='Рецепт', related_name='shopping_cart',
+        db_index=False
     )
 
     class Meta:
@@ -157,3 +205,61 @@ class ShoppingCart(models.Model):
                 name='user_cart_unique'
             )
         ]
+        indexes = [
+            models.Index(fields=['recipe', 'user'],
+                         name='cart_recipe_user_idx'),
+        ]
+
+
+class ShoppingListItem(models.Model):
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        verbose_name='Пользователь', related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE,
+        verbose_name='Ингредиент', related_name='shopping_list',
+    )
+    total_amount = models.IntegerField('Количество', default=0)
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Список покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='user_shopping_list_unique'
+            )
+        ]
+
+
+class RecipeImport(models.Model):
+
+    name = models.CharField('Дамп', max_length=255, unique=True)
+    line = models.PositiveBigIntegerField('Следующая строка', default=0)
+
+    class Meta:
+        verbose_name = 'Загрузка рецептов'
+        verbose_name_plural = 'Загрузки рецептов'
+
+
+class ImportedRecipe(models.Model):
+
+    recipe_import = models.ForeignKey(
+        RecipeImport, on_delete=models.CASCADE,
+        verbose_name='Загрузка', related_name='recipes',
+    )
+    source_id = models.BigIntegerField('Идентификатор в дампе')
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        verbose_name='Рецепт', related_name='+',
+    )
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['recipe_import', 'source_id'],
+                name='imported_recipe_unique'
+            )
+        ]
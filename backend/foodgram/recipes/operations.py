@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+class PostgresOnly:
+    """Меняет схему только в PostgreSQL, состояние миграций - всегда."""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor,
+                                      from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor,
+                                       from_state, to_state)
+
+
+class AddPostgresIndex(PostgresOnly, migrations.AddIndex):
+    pass
+
+
+class RunPostgresSQL(PostgresOnly, migrations.RunSQL):
+    pass
+
+
+class AlterPostgresField(PostgresOnly, migrations.AlterField):
+    pass
+
+
+class AddPostgresConstraint(PostgresOnly, migrations.AddConstraint):
+    pass
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, RecipeIngredients
+
+
+def recipe_search_vector():
+    ingredient_names = RecipeIngredients.objects.filter(
+        recipe=OuterRef('pk')
+    ).values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    return (
+        SearchVector('name', weight='A', config=settings.SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(Subquery(ingredient_names), Value(''),
+                     output_field=TextField()),
+            weight='B', config=settings.SEARCH_CONFIG
+        )
+        + SearchVector('text', weight='C', config=settings.SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(recipe_ids):
+    if connection.vendor != 'postgresql':
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        search_vector=recipe_search_vector()
+    )
+
+
+def search_recipes(queryset, text):
+    text = text.strip()
+    if not text:
+        return queryset
+    if connection.vendor != 'postgresql':
+        return queryset.filter(
+            Q(name__icontains=text)
+            | Q(text__icontains=text)
+            | Q(ingredients__name__icontains=text)
+        ).distinct()
+
+    query = SearchQuery(text, search_type='websearch',
+                        config=settings.SEARCH_CONFIG)
+    return queryset.filter(
+        Q(search_vector=query) | Q(name__trigram_similar=text)
+    ).annotate(
+        rank=SearchRank(F('search_vector'), query),
+        similarity=TrigramSimilarity('name', text),
+    ).order_by('-rank', '-similarity', '-pub_date')
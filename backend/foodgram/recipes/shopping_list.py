@@ -0,0 +1,83 @@
+from django.db.models import Case, F, Sum, Value, When
+
+from .models import RecipeIngredients, ShoppingCart, ShoppingListItem
+
+
+def recipe_amounts(recipe_id):
+    return dict(RecipeIngredients.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', 'amount'))
+
+
+def apply_deltas(user_ids, deltas):
+    user_ids = list(user_ids)
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+    ShoppingListItem.objects.bulk_create([
+        ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+        for user_id in user_ids
+        for ingredient_id, delta in deltas.items() if delta > 0
+    ], ignore_conflicts=True)
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas)
+    items.update(total_amount=F('total_amount') + Case(
+        *[When(ingredient_id=ingredient_id, then=Value(delta))
+          for ingredient_id, delta in deltas.items()],
+        default=Value(0)
+    ))
+    items.filter(total_amount__lte=0).delete()
+
+
+def recipes_amounts(recipe_ids):
+    return dict(RecipeIngredients.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('ingredient_id').annotate(
+        total=Sum('amount')
+    ).order_by().values_list('ingredient_id', 'total'))
+
+
+def add_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], recipes_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in recipes_amounts(recipe_ids).items()
+    })
+
+
+def add_recipe(user_id, recipe_id):
+    add_recipes(user_id, [recipe_id])
+
+
+def remove_recipe(user_id, recipe_id):
+    remove_recipes(user_id, [recipe_id])
+
+
+def change_recipe(recipe_id, old_amounts, new_amounts):
+    deltas = {
+        ingredient_id: (new_amounts.get(ingredient_id, 0)
+                        - old_amounts.get(ingredient_id, 0))
+        for ingredient_id in old_amounts.keys() | new_amounts.keys()
+    }
+    apply_deltas(
+        ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True),
+        deltas
+    )
+
+
+def live_totals():
+    return RecipeIngredients.objects.filter(
+        recipe__shopping_cart__isnull=False
+    ).values(
+        'recipe__shopping_cart__user_id', 'ingredient_id'
+    ).annotate(
+        total=Sum('amount')
+    ).order_by(
+        'recipe__shopping_cart__user_id', 'ingredient_id'
+    ).values_list('recipe__shopping_cart__user_id', 'ingredient_id', 'total')
@@ -0,0 +1,143 @@
+from django.db.models import F
+from django.utils import timezone
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import Signal, receiver
+
+from users.models import Subscription
+from .image_tasks import needs_variants, schedule_variants
+from .models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+    User,
+)
+from .search import update_search_vector
+from .shopping_list import change_recipe, recipe_amounts
+from .tag_masks import clear_tag_mask, free_mask
+from .versions import (
+    INGREDIENTS_VERSION,
+    RECIPES_VERSION,
+    TAGS_VERSION,
+    bump_many_on_commit,
+    bump_on_commit,
+    cart_version_key,
+    favorites_version_key,
+    subscriptions_version_key,
+)
+
+PROFILE_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+recipe_changed = Signal()
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    bump_on_commit(INGREDIENTS_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tags_changed(sender, **kwargs):
+    bump_on_commit(TAGS_VERSION)
+
+
+@receiver(pre_save, sender=Tag)
+def assign_tag_mask(sender, instance, **kwargs):
+    if instance.mask is None:
+        instance.mask = free_mask()
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    if instance.mask:
+        clear_tag_mask(instance.mask)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if not created:
+        recipes = Recipe.objects.filter(ingredients=instance).values('pk')
+        update_search_vector(recipes)
+        Recipe.objects.filter(pk__in=recipes).update(
+            updated_at=timezone.now())
+        # Выгрузки списка покупок содержат название и единицы измерения.
+        bump_many_on_commit(
+            cart_version_key(user_id) for user_id in
+            ShoppingListItem.objects.filter(ingredient=instance).values_list(
+                'user_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=User)
+def author_renamed(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields and not PROFILE_FIELDS & update_fields):
+        return
+    Recipe.objects.filter(author=instance).update(updated_at=timezone.now())
+
+
+@receiver(recipe_changed, sender=Recipe)
+def refresh_search_vector(sender, recipe, **kwargs):
+    update_search_vector([recipe.pk])
+
+
+@receiver(recipe_changed, sender=Recipe)
+def invalidate_carts(sender, recipe, ingredients_changed=True, **kwargs):
+    if not ingredients_changed:
+        return
+    bump_many_on_commit(
+        cart_version_key(user_id) for user_id in
+        ShoppingCart.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def cart_changed(sender, instance, **kwargs):
+    bump_on_commit(cart_version_key(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+def favorites_changed(sender, instance, **kwargs):
+    bump_on_commit(favorites_version_key(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def subscriptions_changed(sender, instance, **kwargs):
+    bump_on_commit(subscriptions_version_key(instance.user_id))
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_from_shopping_lists(sender, instance, **kwargs):
+    change_recipe(instance.pk, recipe_amounts(instance.pk), {})
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    if needs_variants(instance):
+        schedule_variants(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    User.objects.filter(pk=instance.author_id).update(
+        recipes_count=F('recipes_count') - 1)
+    bump_on_commit(RECIPES_VERSION)
+
+
+@receiver(pre_delete, sender=User)
+def release_user_counters(sender, instance, **kwargs):
+    Recipe.objects.filter(favorites__user=instance).update(
+        favorites_count=F('favorites_count') - 1)
+    Recipe.objects.filter(shopping_cart__user=instance).update(
+        in_carts_count=F('in_carts_count') - 1)
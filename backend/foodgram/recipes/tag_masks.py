@@ -0,0 +1,94 @@
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, RecipeTag, Tag, TagBits
+from .versions import TAGS_VERSION, aget_version, bump_on_commit, get_version
+
+# Старший бит bigint знаковый, поэтому маски тэгов занимают биты 0-62.
+MAX_TAGS = 63
+
+
+def free_masks():
+    used = set(Tag.objects.exclude(mask=None).values_list('mask', flat=True))
+    for bit in range(MAX_TAGS):
+        if 1 << bit not in used:
+            yield 1 << bit
+
+
+def free_mask():
+    mask = next(free_masks(), None)
+    if mask is None:
+        raise ValueError(f'Тэгов не может быть больше {MAX_TAGS}.')
+    return mask
+
+
+def assign_tag_masks():
+    """Выдаёт биты тэгам, созданным в обход save(), например bulk_create."""
+    tags = list(Tag.objects.filter(mask=None).order_by('pk'))
+    masks = free_masks()
+    for tag in tags:
+        tag.mask = next(masks, None)
+        if tag.mask is None:
+            raise ValueError(f'Тэгов не может быть больше {MAX_TAGS}.')
+    if tags:
+        Tag.objects.bulk_update(tags, ['mask'])
+        bump_on_commit(TAGS_VERSION)
+    return len(tags)
+
+
+def masks_by_slug():
+    """Биты тэгов по slug из кэша; ключ меняется с версией тэгов."""
+    key = f'tags:masks:{get_version(TAGS_VERSION)}'
+    masks = cache.get(key)
+    if masks is None:
+        masks = dict(Tag.objects.values_list('slug', 'mask'))
+        cache.set(key, masks)
+    return masks
+
+
+async def amasks_by_slug():
+    key = f'tags:masks:{await aget_version(TAGS_VERSION)}'
+    masks = await cache.aget(key)
+    if masks is None:
+        masks = {slug: mask async for slug, mask in Tag.objects.values_list(
+            'slug', 'mask')}
+        await cache.aset(key, masks)
+    return masks
+
+
+def mask_of(tags):
+    return sum(tag.mask or 0 for tag in tags)
+
+
+def tag_mask_subquery():
+    """Маска тэгов рецепта по строкам RecipeTag: биты разные, сумма = OR."""
+    return Coalesce(Subquery(
+        RecipeTag.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe').annotate(total=Sum('tag__mask')).values('total')
+    ), 0)
+
+
+def clear_tag_mask(mask):
+    Recipe.objects.alias(tagged=F('tag_mask').bitand(mask)).filter(
+        tagged__gt=0).update(tag_mask=F('tag_mask').bitand(~mask))
+
+
+def filter_by_tags(queryset, slugs, match_all=False):
+    masks = [masks_by_slug().get(slug) for slug in set(slugs)]
+    # Тэг без бита не стоит ни у одного рецепта: все тэги сразу такой
+    # рецепт иметь не может, а в «любом из» тэг просто не участвует.
+    if match_all and not all(masks):
+        return queryset.none()
+    mask = sum(filter(None, masks))
+    if connection.vendor == 'postgresql':
+        bits = [bit for bit in range(MAX_TAGS) if mask & 1 << bit]
+        queryset = queryset.alias(tag_bits=TagBits('tag_mask'))
+        if match_all:
+            return queryset.filter(tag_bits__contains=bits)
+        return queryset.filter(tag_bits__overlap=bits)
+    queryset = queryset.alias(matched_tags=F('tag_mask').bitand(mask))
+    if match_all:
+        return queryset.filter(matched_tags=mask)
+    return queryset.filter(matched_tags__gt=0)
@@ -0,0 +1,85 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+INGREDIENTS_VERSION = 'ingredients:version'
+TAGS_VERSION = 'tags:version'
+RECIPES_VERSION = 'recipes:version'
+# Меняется вместе со счётчиками избранного и корзин рецептов.
+COUNTERS_VERSION = 'recipes:counters:version'
+
+
+def cart_version_key(user_id):
+    return f'cart:{user_id}:version'
+
+
+def favorites_version_key(user_id):
+    return f'favorites:{user_id}:version'
+
+
+def subscriptions_version_key(user_id):
+    return f'subscriptions:{user_id}:version'
+
+
+def user_version_keys(user_id):
+    return [
+        cart_version_key(user_id),
+        favorites_version_key(user_id),
+        subscriptions_version_key(user_id),
+    ]
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is not None:
+        return version
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = get_version(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_version(key):
+    version = await cache.aget(key)
+    if version is not None:
+        return version
+    await cache.aadd(key, time.time_ns(), None)
+    return await cache.aget(key)
+
+
+async def aget_versions(keys):
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = await aget_version(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(key):
+    version = time.time_ns()
+    cache.set(key, version, None)
+    return version
+
+
+def bump_versions(keys):
+    version = time.time_ns()
+    cache.set_many({key: version for key in keys}, None)
+
+
+# Версии меняются после фиксации: иначе параллельный читатель успеет
+# положить в кэш старые данные под новой версией.
+def bump_on_commit(key):
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def bump_many_on_commit(keys):
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: bump_versions(keys))
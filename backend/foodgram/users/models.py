@@ -14,6 +14,8 @@ class User(AbstractUser):
                                   max_length=200)
     last_name = models.CharField('Фамилия', blank=False,
                                  max_length=200)
+    recipes_count = models.PositiveIntegerField('Рецептов', default=0,
+                                                editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -38,7 +40,8 @@ class Subscription(models.Model):
         User,
         related_name='author',
         on_delete=models.CASCADE,
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False
     )
 
     class Meta:
@@ -48,6 +51,10 @@ class Subscription(models.Model):
                 name='subscribe_unique'
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='subscription_author_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user} оформил подписку на {self.author}'